@@ -0,0 +1,387 @@
+"""
+Rendering and event dispatch benchmarks for Polaron.
+Synthetic Node trees are rendered on a headless Display and the results are printed as JSON, so they can be compared across versions.
+Run "python benchmark.py --help" for the options.
+"""
+
+from os import environ as OS_ENV_VARS
+OS_ENV_VARS.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+from argparse import ArgumentParser, SUPPRESS
+from gc import collect
+from json import dumps as to_json
+from platform import platform, python_version
+from random import Random
+from time import perf_counter, sleep, time
+from sys import stdout
+import tracemalloc
+
+import pygame
+from pygame import Surface
+
+from ui import Application, Display
+from ui.actions import PropertyChangeReceiver, MouseReceiver
+from ui.components import Node, Text, EditableText, Button, ScrollableContainer, Image, Checkbox
+from ui.components.pool import POOL
+from ui.threaded import ThreadedDisplay, start_app
+
+WIDTH = 800
+HEIGHT = 600
+LOREM = ("Polaron renders trees of Nodes onto a single surface and only redraws the parts that changed. "
+         "This paragraph is repeated to give the text layout something to wrap. ")
+
+def summarize(samples) -> dict:
+    """Returns the mean, median, 95th percentile and maximum of timings in seconds, in milliseconds."""
+    ordered = sorted(samples)
+    if len(ordered) == 0:
+        return {}
+    return {
+        "count": len(ordered),
+        "mean_ms": sum(ordered) / len(ordered) * 1000,
+        "median_ms": ordered[len(ordered) // 2] * 1000,
+        "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+        "max_ms": ordered[-1] * 1000
+        }
+
+def build_deep(root, size):
+    """A chain of nested Nodes, each slightly smaller than its parent."""
+    parent = root
+    for i in range(size):
+        node = Node(x=1, y=1, width=max(1, WIDTH - 2 * (i + 1)), height=max(1, HEIGHT - 2 * (i + 1)),
+                    style={"background_color": (i % 256, 100, 150)})
+        node.attach_receiver(MouseReceiver())
+        parent.add(node)
+        parent = node
+    return parent
+
+def build_wide(root, size):
+    """A grid of small Nodes directly under the root."""
+    columns = max(1, int(size ** 0.5))
+    cell = max(2, min(WIDTH, HEIGHT) // columns)
+    nodes = []
+    for i in range(size):
+        node = Node(x=(i % columns) * cell, y=(i // columns) * cell, width=cell - 1, height=cell - 1,
+                    style={"background_color": (i % 256, 200, 100)})
+        node.attach_receiver(MouseReceiver())
+        nodes.append(node)
+    root.add(*nodes)
+    return nodes[-1]
+
+def build_text(root, size):
+    """Wrapped multi-line Text Nodes and Buttons."""
+    last = None
+    for i in range(size):
+        if i % 4 == 0:
+            last = Button(x=(i % 8) * 100, y=(i // 8) * 24 % HEIGHT, width=90, height=22, text="Button " + str(i))
+        else:
+            last = Text(x=(i % 8) * 100, y=(i // 8) * 24 % HEIGHT, width=95, restrict_width=True, text=LOREM[:60 + i % 80])
+        root.add(last)
+    return last
+
+def build_image(root, size):
+    """Image Nodes showing generated Surfaces."""
+    last = None
+    for i in range(size):
+        surface = Surface((64, 48))
+        surface.fill(((i * 37) % 256, (i * 91) % 256, (i * 13) % 256))
+        pygame.draw.circle(surface, (255, 255, 255), (32, 24), 16)
+        last = Image(x=(i * 50) % WIDTH, y=(i * 30) % HEIGHT, width=64, height=48, image=surface)
+        root.add(last)
+    return last
+
+def build_scroll(root, size):
+    """A ScrollableContainer holding a long column of Buttons."""
+    container = ScrollableContainer(x=0, y=0, width=WIDTH, height=HEIGHT)
+    container.add(*[Button(x=10, y=i * 30, width=200, height=26, text="Row " + str(i)) for i in range(size)])
+    root.add(container)
+    return container
+
+SCENARIOS = {
+    "deep": (build_deep, 200),
+    "wide": (build_wide, 2000),
+    "text": (build_text, 300),
+    "image": (build_image, 300),
+    "scroll": (build_scroll, 500)
+    }
+
+def bench_scenario(name, scale, frames, seed) -> dict:
+    """Build one scenario on a headless Display and time rendering and event dispatch."""
+    build, size = SCENARIOS[name]
+    size = max(1, int(size * scale))
+    rng = Random(seed)
+    display = Display(WIDTH, HEIGHT, headless=True)
+    root = display.root
+    start = perf_counter()
+    target = build(root, size)
+    build_time = perf_counter() - start
+    
+    editor = EditableText(x=0, y=HEIGHT - 20, width=200, text="")
+    root.add(editor)
+    editor.focused = True
+    changes = []
+    target.attach_receiver(PropertyChangeReceiver("name", lambda evt, *_: changes.append(evt.value)))
+    
+    start = perf_counter()
+    display.render()
+    first_frame = perf_counter() - start
+    root.pop_blit_counts()
+    
+    full = []
+    for _ in range(frames):
+        for node in [target] + root.children:
+            node.mark_dirty()
+        start = perf_counter()
+        display.render()
+        full.append(perf_counter() - start)
+    opaque_blits, alpha_blits = root.pop_blit_counts()
+    
+    incremental = []
+    for i in range(frames):
+        if isinstance(target, ScrollableContainer):
+            target.scroll(0, -1 if i % 2 == 0 else 1)
+        else:
+            target.style["background_color"] = (i % 256, 0, 0)
+        start = perf_counter()
+        display.render()
+        incremental.append(perf_counter() - start)
+    
+    idle = []
+    for _ in range(frames):
+        start = perf_counter()
+        display.render()
+        idle.append(perf_counter() - start)
+    
+    mouse = []
+    for _ in range(frames * 10):
+        evt = pygame.event.Event(pygame.MOUSEMOTION, pos=(rng.randrange(WIDTH), rng.randrange(HEIGHT)), rel=(1, 1), buttons=(0, 0, 0))
+        start = perf_counter()
+        root.receive_event(evt)
+        mouse.append(perf_counter() - start)
+    
+    keyboard = []
+    for _ in range(frames * 10):
+        evt = pygame.event.Event(pygame.KEYUP, key=97, mod=0, unicode="a")
+        evt.modifiers = 0
+        start = perf_counter()
+        root.receive_event(evt)
+        keyboard.append(perf_counter() - start)
+    
+    property_change = []
+    for i in range(frames * 10):
+        start = perf_counter()
+        target.name = "node" + str(i)
+        property_change.append(perf_counter() - start)
+    
+    return {
+        "nodes": size,
+        "build_ms": build_time * 1000,
+        "first_frame_ms": first_frame * 1000,
+        "render_full": summarize(full),
+        "opaque_blit_share": opaque_blits / max(1, opaque_blits + alpha_blits),
+        "render_incremental": summarize(incremental),
+        "render_idle": summarize(idle),
+        "event_mouse_motion": summarize(mouse),
+        "event_keyboard": summarize(keyboard),
+        "event_property_change": summarize(property_change),
+        "property_change_delivered": len(changes) == frames * 10
+        }
+
+def bench_fit_text(scale) -> dict:
+    """Time wrapping a long text, in lines and characters per second."""
+    Display(WIDTH, HEIGHT, headless=True)
+    text = "\n".join([LOREM * 3] * max(1, int(200 * scale)))
+    node = Text(width=400, restrict_width=True, text=text)
+    runs = []
+    for _ in range(5):
+        start = perf_counter()
+        node._fit_text()
+        runs.append(perf_counter() - start)
+    best = min(runs)
+    return {
+        "characters": len(text),
+        "lines": len(node._text_lines),
+        "fit": summarize(runs),
+        "lines_per_s": len(node._text_lines) / best,
+        "characters_per_s": len(text) / best
+        }
+
+MEMORY_COMPONENTS = {
+    "Node": lambda i, image: Node(x=i % 40, y=i // 40, width=20, height=20),
+    "Text": lambda i, image: Text(text="Row " + str(i)),
+    "EditableText": lambda i, image: EditableText(width=100, text="Row " + str(i)),
+    "Button": lambda i, image: Button(width=80, height=22, text="Button"),
+    "Image": lambda i, image: Image(width=16, height=16, image=image),
+    "Checkbox": lambda i, image: Checkbox(text="Option")
+    }
+
+def surface_bytes(node) -> int:
+    """Returns the size of the pixel data of the Surfaces created in a subtree."""
+    total = 0
+    if node._surface != None:
+        surface = node._surface.get_parent() if node._surface.get_parent() != None else node._surface
+        total += surface.get_pitch() * surface.get_height()
+    for child in node:
+        total += surface_bytes(child)
+    return total
+
+def bench_memory(count) -> dict:
+    """Build and render many Nodes of each component type under one parent and report the memory used per Node."""
+    display = Display(WIDTH, HEIGHT, headless=True)
+    image = Surface((16, 16))
+    results = {}
+    for name, build in MEMORY_COMPONENTS.items():
+        collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        start = perf_counter()
+        parent = Node(width=WIDTH, height=HEIGHT)
+        parent.add(*[build(i, image) for i in range(count)])
+        build_time = perf_counter() - start
+        display.root.add(parent)
+        display.render()
+        python_bytes = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        results[name] = {
+            "nodes": count,
+            "python_bytes_per_node": python_bytes / count,
+            "surface_bytes_per_node": surface_bytes(parent) / count,
+            "build_ms_per_1000": build_time * 1000000 / count
+            }
+        display.root.remove(parent)
+        del parent
+    return results
+
+def bench_resize(frames) -> dict:
+    """Time frames while the window is dragged larger, several VIDEORESIZE events per frame, with a panel that fills the window."""
+    display = Display(WIDTH, HEIGHT, headless=True)
+    root = display.root
+    panel = Node(width=WIDTH, height=HEIGHT, style={"background_color": (200, 200, 200)})
+    panel.add(*[Text(x=10, y=20 * i, text="Row " + str(i)) for i in range(20)])
+    root.add(panel)
+    root.attach_receiver(PropertyChangeReceiver("size", lambda *_: setattr(panel, "size", root.size)))
+    display.render()
+    allocations = POOL.allocations
+    times = []
+    for i in range(frames):
+        for step in range(5):
+            root.receive_event(pygame.event.Event(pygame.VIDEORESIZE, size=(WIDTH + i * 5 + step, HEIGHT + i * 5 + step)))
+        start = perf_counter()
+        display.render()
+        times.append(perf_counter() - start)
+    return {
+        "events_per_frame": 5,
+        "frame": summarize(times),
+        "final_size": list(display.size),
+        "surface_allocations": POOL.allocations - allocations
+        }
+
+def bench_children(count) -> dict:
+    """Time adding and removing children one at a time, and raising each child to the top, under a Node and a ScrollableContainer."""
+    results = {}
+    for name, parent in (("Node", Node(width=WIDTH, height=HEIGHT)), ("ScrollableContainer", ScrollableContainer(width=WIDTH, height=HEIGHT))):
+        nodes = [Node(x=i % 40, y=i // 40, width=20, height=20) for i in range(count)]
+        start = perf_counter()
+        for node in nodes:
+            parent.add(node)
+        add_time = perf_counter() - start
+        start = perf_counter()
+        for node in nodes:
+            parent.raise_child(node)
+        raise_time = perf_counter() - start
+        start = perf_counter()
+        for node in nodes:
+            parent.remove(node)
+        remove_time = perf_counter() - start
+        results[name] = {
+            "children": count,
+            "add_ms": add_time * 1000,
+            "raise_ms": raise_time * 1000,
+            "remove_ms": remove_time * 1000
+            }
+    return results
+
+def bench_threaded(duration, transports) -> dict:
+    """Run an animated child app and count the frames shown by a headless parent for each transport."""
+    results = {}
+    for transport in transports:
+        display = Display(WIDTH, HEIGHT, headless=True)
+        app = Application(display, fps=0)
+        child = ThreadedDisplay(*start_app(__file__, None, "--child", transport=transport))
+        display.root.add(child)
+        start = time()
+        while child.frame_stats["shown"] == 0 and time() - start < 10:
+            app.event_monitor._monitor()
+            display.render()
+            sleep(0.001)
+        startup = time() - start
+        shown = child.frame_stats["shown"]
+        start = time()
+        while time() - start < duration:
+            app.event_monitor._monitor()
+            display.render()
+            sleep(0.001)
+        stats = child.frame_stats
+        child.process.kill()
+        child.process.wait()
+        results[transport] = {
+            "first_frame_ms": startup * 1000,
+            "frames_per_s": (stats["shown"] - shown) / duration,
+            "received": stats["received"],
+            "dropped": stats["dropped"]
+            }
+    return results
+
+def run_child():
+    """The app run by bench_threaded: a full-window Node that changes color every frame."""
+    class Pulse(Node):
+        def tick(self):
+            self.style["background_color"] = ((self.style["background_color"][0] + 3) % 256, 80, 160)
+    app = Application(Display(WIDTH, HEIGHT), fps=240)
+    pulse = Pulse(x=0, y=0, width=WIDTH, height=HEIGHT, style={"background_color": (0, 80, 160)})
+    pulse.animated = True
+    app.display.root.add(pulse)
+    app.launch()
+
+def main():
+    parser = ArgumentParser(description="Benchmark Polaron rendering and event dispatch.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated scenarios to run: " + ", ".join(SCENARIOS))
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier for the number of Nodes in each scenario.")
+    parser.add_argument("--frames", type=int, default=60, help="Frames to render per measurement.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--memory", type=int, default=5000, help="Nodes of each type to build for the memory benchmark, 0 to skip.")
+    parser.add_argument("--threaded", type=float, default=3.0, help="Seconds to run each threaded transport for, 0 to skip.")
+    parser.add_argument("--transports", default="shared,stdout")
+    parser.add_argument("--output", default=None, help="File to write the JSON results to. Default stdout.")
+    parser.add_argument("--child", action="store_true", help=SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_child()
+        return
+    
+    results = {
+        "time": time(),
+        "python": python_version(),
+        "pygame": pygame.version.ver,
+        "platform": platform(),
+        "config": {"frames": args.frames, "scale": args.scale, "seed": args.seed},
+        "scenarios": {},
+        }
+    for name in args.scenarios.split(","):
+        results["scenarios"][name] = bench_scenario(name, args.scale, args.frames, args.seed)
+    results["fit_text"] = bench_fit_text(args.scale)
+    results["resize"] = bench_resize(args.frames)
+    results["children"] = bench_children(max(1, int(5000 * args.scale)))
+    if args.memory > 0:
+        results["memory"] = bench_memory(args.memory)
+    if args.threaded > 0:
+        results["threaded"] = bench_threaded(args.threaded, args.transports.split(","))
+    
+    output = to_json(results, indent=2)
+    if args.output != None:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        stdout.write(output + "\n")
+
+if __name__ == "__main__":
+    main()
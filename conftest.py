@@ -0,0 +1,11 @@
+"""
+pytest configuration. The tests render on a headless Display, so no display server is needed.
+test.py and test_wm.py are demo apps rather than tests, and are not collected.
+"""
+
+from os import environ as OS_ENV_VARS
+
+OS_ENV_VARS.setdefault("SDL_VIDEODRIVER", "dummy")
+OS_ENV_VARS.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+collect_ignore = ["test.py", "test_wm.py", "benchmark.py"]
@@ -0,0 +1,22 @@
+"""
+Checks that drawing inside a clip area changes the same pixels as drawing everything and copying that area.
+"""
+
+import pytest
+from pygame import Rect, Surface
+
+from ui.components import _draw_border
+
+@pytest.mark.parametrize("clip", [Rect(10, 10, 30, 4), Rect(10, 10, 4, 30), Rect(0, 38, 50, 2), Rect(20, 15, 10, 10)])
+def test_border_respects_clip(clip):
+    expected = Surface((50, 40))
+    _draw_border(expected, (255, 0, 0), Rect(0, 0, 50, 40), 3)
+    clipped = Surface((50, 40))
+    clipped.set_clip(clip)
+    _draw_border(clipped, (255, 0, 0), Rect(0, 0, 50, 40), 3)
+    for x in range(50):
+        for y in range(40):
+            if clip.collidepoint(x, y):
+                assert clipped.get_at((x, y)) == expected.get_at((x, y))
+            else:
+                assert clipped.get_at((x, y)) == (0, 0, 0, 255)
@@ -0,0 +1,51 @@
+"""
+Checks that events are routed to the same receivers, in the same order, as a depth-first walk of the tree.
+"""
+
+import pygame
+
+from ui import Display
+from ui.actions import EventReceiver, KeyboardReceiver
+from ui.components import Node
+
+def walk_order(node, evt_type) -> list:
+    """Returns the Nodes with receivers for the event type in the order a depth-first walk visits them, children first."""
+    found = []
+    for child in node:
+        found.extend(walk_order(child, evt_type))
+    if node.get_receivers(evt_type):
+        found.append(node)
+    return found
+
+def test_dispatch_order_follows_tree_changes():
+    display = Display(100, 100, headless=True)
+    received = []
+    nodes = []
+    for i in range(6):
+        node = Node(name=str(i))
+        node.attach_receiver(EventReceiver(pygame.USEREVENT, lambda evt, n=node: received.append(n)))
+        (nodes[i // 2] if i > 1 else display.root).add(node)
+        nodes.append(node)
+    for change in (lambda: None, lambda: nodes[1].raise_child(nodes[2]), lambda: nodes[2].lower_child(nodes[5]),
+                   lambda: display.root.raise_child(nodes[0]), lambda: nodes[4].add(Node()), lambda: (nodes[1].remove(nodes[3]), nodes[2].insert(0, nodes[3]))):
+        change()
+        received.clear()
+        display.root.receive_event(pygame.event.Event(pygame.USEREVENT))
+        assert received == walk_order(display.root, pygame.USEREVENT)
+
+def test_key_events_go_to_the_focused_node():
+    display = Display(100, 100, headless=True)
+    received = []
+    first, second, listener = Node(), Node(), Node()
+    for node in (first, second):
+        node.attach_receiver(KeyboardReceiver(node, lambda evt, n=node: received.append(n)))
+    listener.attach_receiver(EventReceiver(pygame.KEYDOWN, lambda evt: received.append(listener)))
+    display.root.add(first, second, listener)
+    second.focused = True
+    display.root.receive_event(pygame.event.Event(pygame.KEYDOWN, key=97))
+    assert received == [second, listener]
+    received.clear()
+    first.focused = True
+    display.root.receive_event(pygame.event.Event(pygame.KEYDOWN, key=97))
+    assert received == [first, listener]
+    assert not second.focused
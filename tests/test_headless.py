@@ -0,0 +1,36 @@
+"""
+Checks that scripted Applications run on a headless Display and that their frames can be exported.
+"""
+
+import pygame
+from pygame.image import load as load_image, tostring as surface_to_str
+
+from ui import Display, Application
+from ui.actions import EventReceiver
+from ui.components import Node
+
+def test_script_drives_the_application_until_it_ends(tmp_path):
+    display = Display(60, 40, headless=True)
+    box = Node(width=10, height=10, style={"background_color": (0, 255, 0)})
+    box.attach_receiver(EventReceiver(pygame.USEREVENT, lambda evt: setattr(box, "x", evt.x)))
+    display.root.add(box)
+    frames = []
+    app = Application(display, fps=0, script=[[], [pygame.event.Event(pygame.USEREVENT, x=30)], []])
+    app.on_frame = lambda display: frames.append(display.frame_bytes("RGB"))
+    app.launch()
+    assert len(frames) == 3
+    assert frames[0] != frames[1] and frames[1] == frames[2]
+    assert display.surface.get_at((35, 5))[:3] == (0, 255, 0)
+    display.save(str(tmp_path / "frame.png"))
+    assert surface_to_str(load_image(str(tmp_path / "frame.png")), "RGB") == frames[-1]
+
+def test_posted_events_reach_their_receivers_during_a_script():
+    display = Display(20, 20, headless=True)
+    pygame.event.clear()
+    received = []
+    node = Node()
+    node.attach_receiver(EventReceiver(pygame.USEREVENT, lambda evt: pygame.event.post(pygame.event.Event(pygame.USEREVENT + 1, value=evt.value))))
+    node.attach_receiver(EventReceiver(pygame.USEREVENT + 1, lambda evt: received.append(evt.value)))
+    display.root.add(node)
+    Application(display, fps=0, script=[[pygame.event.Event(pygame.USEREVENT, value=7)], []]).launch()
+    assert received == [7]
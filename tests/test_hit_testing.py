@@ -0,0 +1,66 @@
+"""
+Checks that the Nodes found through the HitGrid are the ones MouseReceiver.check finds by testing every Node.
+"""
+
+from random import Random
+
+import pytest
+import pygame
+
+from ui import Display
+from ui.actions import MouseReceiver
+from ui.components import Node, ScrollableContainer
+
+def build_tree(rng, parent, targets, depth=0):
+    """Add random Nodes with MouseReceivers under parent, including nested ScrollableContainers."""
+    for _ in range(rng.randint(2, 5)):
+        position = {"x": rng.randint(-20, 180), "y": rng.randint(-20, 130), "width": rng.randint(5, 90), "height": rng.randint(5, 90)}
+        node = ScrollableContainer(**position) if depth < 2 and rng.random() < 0.2 else Node(**position)
+        node.attach_receiver(MouseReceiver())
+        parent.add(node)
+        targets.append(node)
+        if depth < 3 and rng.random() < 0.4:
+            build_tree(rng, node, targets, depth + 1)
+
+def mouse_targets(node) -> list:
+    """Returns the Nodes in a tree with MouseReceivers, such as the targets and the scroll bars of the containers."""
+    found = []
+    for receivers in node.receivers.values():
+        if any(isinstance(receiver, MouseReceiver) for receiver in receivers):
+            found.append(node)
+            break
+    for child in node:
+        found.extend(mouse_targets(child))
+    return found
+
+def accepted(nodes, pos) -> set:
+    """Returns the Nodes whose MouseReceiver accepts a mouse motion at pos."""
+    evt = pygame.event.Event(pygame.MOUSEMOTION, pos=pos, rel=(0, 0), buttons=(0, 0, 0))
+    return {node for node in nodes if node.get_receivers(pygame.MOUSEMOTION)[0].check(evt)}
+
+def containing(nodes, pos) -> set:
+    """Returns the Nodes whose absolute bounds contain pos, edges included."""
+    return {node for node in nodes
+            if node.absolute_rect.left <= pos[0] <= node.absolute_rect.right and node.absolute_rect.top <= pos[1] <= node.absolute_rect.bottom}
+
+@pytest.mark.parametrize("seed", range(5))
+def test_hit_grid_matches_brute_force(seed):
+    rng = Random(seed)
+    display = Display(200, 150, headless=True)
+    targets = []
+    build_tree(rng, display.root, targets)
+    for step in range(40):
+        node = rng.choice(targets)
+        if step % 3 == 0:
+            node.position = (node.x + rng.randint(-20, 20), node.y + rng.randint(-20, 20))
+        elif step % 3 == 1:
+            node.size = (max(1, node.width + rng.randint(-10, 10)), max(1, node.height + rng.randint(-10, 10)))
+        else:
+            containers = [n for n in targets if isinstance(n, ScrollableContainer)]
+            if len(containers) > 0:
+                rng.choice(containers).scroll(0, rng.randint(-15, 15))
+        for _ in range(25):
+            pos = (rng.randint(-5, 205), rng.randint(-5, 155))
+            hits = set(display.root.nodes_at(pos))
+            assert hits == containing(mouse_targets(display.root), pos), "hits differ at " + str(pos) + " after step " + str(step)
+            assert accepted(hits & set(targets), pos) == accepted(targets, pos), "receivers differ at " + str(pos) + " after step " + str(step)
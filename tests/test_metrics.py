@@ -0,0 +1,34 @@
+"""
+Checks the text measurements cached by MetricsCache.
+"""
+
+from ui.components.metrics import MetricsCache
+from ui.config import CONFIGURATION
+
+def test_least_recently_used_measurements_are_discarded():
+    regular = CONFIGURATION["DEFAULT_FONTS"]["regular"]
+    cache = MetricsCache(3)
+    for text in ("a", "b", "c"):
+        cache.measure(regular, text, 12)
+    cache.measure(regular, "a", 12)
+    cache.measure(regular, "d", 12)
+    assert list(cache._sizes) == [(regular, 12, "c"), (regular, 12, "a"), (regular, 12, "d")]
+    for text in ("w", "x", "y", "z"):
+        cache.advances(regular, text, 12)
+    assert len(cache._advances) == 3
+    assert cache.measure(regular, "b", 12) == tuple(regular.get_rect("b", size=12).size)
+
+def test_advances_follow_the_glyph_metrics():
+    regular = CONFIGURATION["DEFAULT_FONTS"]["regular"]
+    cache = MetricsCache(10)
+    text = "Hello, World"
+    advances = cache.advances(regular, text, 16)
+    assert len(advances) == len(text) + 1
+    assert advances[0] == 0
+    total = 0.0
+    for i, metrics in enumerate(regular.get_metrics(text, size=16)):
+        total += metrics[4]
+        assert advances[i + 1] == int(round(total))
+    assert cache.column_at(regular, text, 16, advances[4] + 0.5) == 4
+    assert cache.column_at(regular, text, 16, advances[-1] + 1) == None
+    assert cache.advances(regular, "", 16) == [0]
@@ -0,0 +1,59 @@
+"""
+Checks how Nodes are stored: their slots, weak references, shared default styles and indexed children.
+"""
+
+from gc import collect
+from random import Random
+from weakref import ref, WeakKeyDictionary
+
+from ui.components import Node, Text, ScrollableContainer, VirtualList
+from ui.components.style import Style
+from ui.config import CONFIGURATION
+
+def test_nodes_can_be_weakly_referenced():
+    for kind in (Node, Text, ScrollableContainer, VirtualList):
+        node = kind()
+        reference = ref(node)
+        table = WeakKeyDictionary({node: "value"})
+        assert reference() is node and table[node] == "value"
+        assert not hasattr(node, "__dict__")
+        del node
+        #A Node's style refers back to it, so it is freed by the cycle collector.
+        collect()
+        assert reference() == None and len(table) == 0
+
+def test_merging_a_defaulted_style_keeps_the_defaults_shared():
+    node = Node(style=Style.with_defaults(CONFIGURATION["STYLE_DEFAULTS"], color=(1, 2, 3)))
+    assert node.style.data == {"color": (1, 2, 3)}
+    assert node.style["border"] == CONFIGURATION["STYLE_DEFAULTS"]["border"]
+
+def test_children_keep_the_order_of_the_list_operations():
+    rng = Random(0)
+    parent = Node()
+    expected = []
+    pool = [Node(name=str(i)) for i in range(30)]
+    for _ in range(500):
+        node = rng.choice(pool)
+        op = rng.randint(0, 4)
+        if op == 0 and node not in expected:
+            parent.add(node)
+            expected.append(node)
+        elif op == 1 and node not in expected:
+            index = rng.randint(-5, len(expected) + 5)
+            parent.insert(index, node)
+            expected.insert(index, node)
+        elif op == 2:
+            parent.remove(node)
+            if node in expected:
+                expected.remove(node)
+        elif op == 3 and node in expected:
+            parent.raise_child(node)
+            expected.remove(node)
+            expected.append(node)
+        elif op == 4 and node in expected:
+            parent.lower_child(node)
+            expected.remove(node)
+            expected.insert(0, node)
+        assert parent.children == expected
+        assert all((child in parent) == (child in expected) for child in pool)
+        assert all(child.parent is parent for child in expected)
@@ -0,0 +1,46 @@
+"""
+Checks when the SurfacePool reuses the backings of released Surfaces.
+"""
+
+from ui.components.pool import SurfacePool
+
+def test_released_backings_are_reused_only_after_recycling():
+    pool = SurfacePool(16, 1 << 20, 0.5, 4)
+    first = pool.acquire((30, 20), True)
+    backing = first.get_parent()
+    assert backing.get_size() == (32, 32)
+    pool.release(first)
+    second = pool.acquire((30, 20), True)
+    assert second.get_parent() is not backing
+    assert (pool.allocations, pool.reuses) == (2, 0)
+    pool.recycle()
+    assert pool.acquire((20, 30), False).get_parent() is not backing
+    third = pool.acquire((25, 17), True)
+    assert third.get_parent() is backing
+    assert third.get_size() == (25, 17)
+    assert third.get_at((0, 0)) == (0, 0, 0, 0)
+    assert pool.reuses == 1
+
+def test_shrinking_releases_a_backing_that_is_too_large():
+    pool = SurfacePool(16, 1 << 20, 0.5, 4)
+    surface = pool.acquire((200, 200), False)
+    backing = surface.get_parent()
+    smaller = pool.resize(surface, (150, 180))
+    assert smaller.get_parent() is backing and smaller.get_size() == (150, 180)
+    tiny = pool.resize(smaller, (10, 10))
+    assert tiny.get_parent() is not backing
+    assert pool.acquire((200, 200), False).get_parent() is not backing
+    pool.recycle()
+    assert pool.acquire((200, 200), False).get_parent() is backing
+
+def test_released_backings_are_bounded_by_the_limit():
+    pool = SurfacePool(16, 3 * 64 * 64 * 4, 0.5, 4)
+    backings = []
+    for _ in range(5):
+        surface = pool.acquire((64, 64), True)
+        backings.append(surface.get_parent())
+        pool.release(surface)
+    pool.recycle()
+    reused = [pool.acquire((64, 64), True).get_parent() for _ in range(5)]
+    assert sum(1 for backing in reused if any(backing is kept for kept in backings[2:])) == 3
+    assert not any(backing is dropped for backing in reused for dropped in backings[:2])
@@ -0,0 +1,38 @@
+"""
+Checks that the Profiler records the cost of each Node and leaves Nodes as they were once it is disabled.
+"""
+
+import pytest
+import pygame
+
+from ui import Display, Application
+from ui.actions import EventReceiver, PropertyChangeReceiver
+from ui.components import Node
+from ui.profiling import Profiler
+
+def test_report_and_cleanup():
+    original = Node._on_property_changed
+    display = Display(50, 50, headless=True)
+    node = Node(width=20, height=20, style={"background_color": (0, 0, 255)})
+    node.attach_receiver(EventReceiver(pygame.USEREVENT, lambda evt: setattr(node, "x", node.x + 1)))
+    node.attach_receiver(PropertyChangeReceiver("x"))
+    display.root.add(node)
+    app = Application(display, fps=0, script=[[pygame.event.Event(pygame.USEREVENT)]] * 3)
+    profiler = Profiler(app)
+    profiler.enable()
+    with pytest.raises(RuntimeError):
+        Profiler(app).enable()
+    app.launch()
+    profiler.disable()
+    assert profiler.frames == 3
+    stats = dict((entry["node"], entry) for entry in profiler.report())[str(node)]
+    assert stats["events"] == 6
+    assert stats["notified"] == 3
+    assert stats["property_changes"] == {"x": 3}
+    assert stats["draws"] >= 1
+    assert Node._on_property_changed is original
+    assert Node._profiler == None
+    assert "present" not in display.__dict__
+    assert profiler._toggle_receiver not in display.root.get_receivers(pygame.KEYDOWN)
+    node.x += 1
+    assert profiler.stats[node].property_changes == {"x": 3}
@@ -0,0 +1,43 @@
+"""
+Checks that property changes are delivered to PropertyChangeReceivers once per change, or once per batch.
+"""
+
+from ui.actions import PropertyChangeReceiver
+from ui.components import Node
+
+def watch(node, *props) -> list:
+    """Returns a list that receives a (prop, value) tuple for each change of the properties of node."""
+    seen = []
+    node.attach_receiver(PropertyChangeReceiver(list(props), lambda evt, *_: seen.append((evt.prop, evt.value))))
+    return seen
+
+def test_batch_updates_notify_each_property_once():
+    node = Node(width=10, height=10)
+    seen = watch(node, "x", "width")
+    with node.batch_updates():
+        node.x = 1
+        node.width = 20
+        with node.batch_updates():
+            node.x = 2
+            node.x = 3
+        assert seen == []
+        node.width = 30
+    assert sorted(seen) == [("width", 30), ("x", 3)]
+
+def test_changes_outside_a_batch_notify_immediately():
+    node = Node()
+    seen = watch(node, "x")
+    node.x = 1
+    node.x = 2
+    assert seen == [("x", 1), ("x", 2)]
+
+def test_instance_attributes_of_subclasses_are_notified():
+    class Counter(Node):
+        def increment(self):
+            self.count = getattr(self, "count", 0) + 1
+            self._on_property_changed("count")
+    node = Counter()
+    seen = watch(node, "count")
+    node.increment()
+    node.increment()
+    assert seen == [("count", 1), ("count", 2)]
@@ -0,0 +1,97 @@
+"""
+Checks that rendering only the changed areas gives the same frames as redrawing everything.
+"""
+
+from random import Random
+
+import pytest
+from ui import Display
+from ui.components import Node, Text, ScrollableContainer
+
+def random_color(rng):
+    return (rng.randint(0, 255), rng.randint(0, 255), rng.randint(0, 255), rng.choice([0, 128, 255]))
+
+def build_tree(rng, parent, nodes, depth=0):
+    """Add random Nodes, Texts and ScrollableContainers under parent, some transparent, bordered or partly outside it."""
+    for _ in range(rng.randint(1, 4)):
+        kind = rng.random()
+        position = {"x": rng.randint(-20, 150), "y": rng.randint(-20, 100)}
+        if kind < 0.15 and depth < 2:
+            node = ScrollableContainer(width=rng.randint(20, 120), height=rng.randint(20, 100),
+                                       style={"background_color": random_color(rng)}, **position)
+        elif kind < 0.35:
+            node = Text(text="hello world", style={"background_color": random_color(rng), "color": (255, 255, 255)}, **position)
+        else:
+            node = Node(width=rng.randint(5, 80), height=rng.randint(5, 80),
+                        style={"background_color": random_color(rng), "border": rng.choice([0, 0, 2, 5]),
+                               "border_color": random_color(rng)[:3]}, **position)
+        parent.add(node)
+        nodes.append(node)
+        if depth < 3 and rng.random() < 0.5:
+            build_tree(rng, node, nodes, depth + 1)
+
+def mutate(rng, nodes):
+    """Change one random property of a random Node."""
+    node = rng.choice(nodes)
+    op = rng.randint(0, 7)
+    if op == 0:
+        node.x += rng.randint(-15, 15)
+    elif op == 1:
+        node.y += rng.randint(-15, 15)
+    elif op == 2:
+        node.style["background_color"] = random_color(rng)
+    elif op == 3:
+        node.visible = not node.visible
+    elif op == 4 and node.parent != None:
+        node.parent.raise_child(node)
+    elif op == 5 and isinstance(node, Text):
+        node.text = rng.choice(["a", "hello", "foo bar baz"])
+    elif op == 6:
+        containers = [n for n in nodes if isinstance(n, ScrollableContainer)]
+        if len(containers) > 0:
+            rng.choice(containers).scroll(0, rng.randint(-10, 10))
+    elif op == 7:
+        node.width = max(1, node.width + rng.randint(-10, 10))
+
+def full_redraw(display) -> bytes:
+    """Redraw every Node of the display and return the frame."""
+    pending = [display.root]
+    while len(pending) > 0:
+        node = pending.pop()
+        node.mark_dirty()
+        pending.extend(node.children)
+    display.render()
+    return display.frame_bytes()
+
+@pytest.mark.parametrize("seed", range(6))
+def test_dirty_areas_match_full_redraw(seed):
+    rng = Random(seed)
+    display = Display(200, 150, headless=True)
+    nodes = []
+    build_tree(rng, display.root, nodes)
+    display.render()
+    for step in range(150):
+        mutate(rng, nodes)
+        display.render()
+        assert display.frame_bytes() == full_redraw(display), "frame differs after step " + str(step)
+
+def test_unchanged_siblings_are_not_blitted():
+    display = Display(400, 400, headless=True)
+    for i in range(100):
+        display.root.add(Node(x=(i % 10) * 40, y=(i // 10) * 40, width=38, height=38, style={"background_color": (100, 100, 100)}))
+    label = Text(x=5, y=5, text="0", style={"color": (255, 255, 255)})
+    display.root.add(label)
+    display.render()
+    display.root.pop_blit_counts()
+    label.text = "1"
+    display.render()
+    assert sum(display.root.pop_blit_counts()) <= 2
+
+def test_idle_frame_draws_nothing():
+    display = Display(100, 100, headless=True)
+    display.root.add(Node(x=10, y=10, width=20, height=20, style={"background_color": (255, 0, 0)}))
+    display.render()
+    display.root.pop_blit_counts()
+    display.render()
+    assert display.idle
+    assert display.root.pop_blit_counts() == (0, 0)
@@ -0,0 +1,39 @@
+"""
+Checks that an idle Application sleeps until an event arrives and does not redraw frames in which nothing changed.
+"""
+
+import pygame
+
+from ui import Display, Application
+from ui.actions import EventReceiver
+from ui.components import Node
+from ui.config import CONFIGURATION
+
+def test_idle_application_waits_and_skips_unchanged_frames():
+    display = Display(100, 100, headless=True)
+    box = Node(width=20, height=20, style={"background_color": (255, 0, 0)})
+    box.attach_receiver(EventReceiver(pygame.USEREVENT, lambda evt: setattr(box, "x", box.x + 5)))
+    display.root.add(box)
+    app = Application(display, fps=0, idle=True, script=[[], [], [pygame.event.Event(pygame.USEREVENT)], []])
+    waits = []
+    app.event_monitor.wait = lambda timeout: waits.append(timeout)
+    blits = []
+    waited = []
+    def on_frame(display):
+        blits.append(app.frame_stats["opaque_blits"] + app.frame_stats["alpha_blits"])
+        waited.append(len(waits))
+    app.on_frame = on_frame
+    app.launch()
+    #The first frame draws the new Node; every later frame starts idle.
+    assert waited == [0, 1, 2, 3]
+    assert set(waits) == {CONFIGURATION["IDLE_WAIT_TIMEOUT"]}
+    assert blits[0] > 0 and blits[1] == 0 and blits[2] > 0 and blits[3] == 0
+    assert box.x == 5
+
+def test_busy_application_does_not_wait():
+    display = Display(100, 100, headless=True)
+    app = Application(display, fps=0, script=[[], [], []])
+    waits = []
+    app.event_monitor.wait = lambda timeout: waits.append(timeout)
+    app.launch()
+    assert waits == []
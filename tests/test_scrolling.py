@@ -0,0 +1,55 @@
+"""
+Checks that Nodes inside scrolled ScrollableContainers report the same absolute positions as adding up every offset.
+"""
+
+from random import Random
+
+from ui import Display
+from ui.components import Node, ScrollableContainer
+
+def expected_position(node) -> tuple:
+    """Returns the absolute position of node, computed from the positions of all of its ancestors."""
+    if node.parent == None:
+        return node.position
+    parent_position = expected_position(node.parent)
+    position = node.parent._child_position(node)
+    return (parent_position[0] + position[0], parent_position[1] + position[1])
+
+def test_absolute_positions_follow_scrolling_and_moves():
+    rng = Random(0)
+    display = Display(200, 200, headless=True)
+    outer = ScrollableContainer(x=10, y=20, width=150, height=150)
+    inner = ScrollableContainer(x=30, y=40, width=80, height=80)
+    display.root.add(outer)
+    outer.add(Node(x=0, y=300, width=10, height=10), inner)
+    leaves = [Node(x=rng.randint(0, 200), y=rng.randint(0, 200), width=5, height=5) for _ in range(10)]
+    holder = Node(x=5, y=5, width=100, height=300)
+    holder.add(*leaves[5:])
+    inner.add(holder, *leaves[:5])
+    nodes = [outer, inner, holder] + leaves + [child for child in outer] + [child for child in inner]
+    for _ in range(200):
+        op = rng.randint(0, 3)
+        if op == 0:
+            rng.choice([outer, inner]).scroll(rng.randint(-30, 30), rng.randint(-30, 30))
+        elif op == 1:
+            node = rng.choice(nodes)
+            node.x += rng.randint(-10, 10)
+        elif op == 2:
+            node = rng.choice(leaves)
+            node.parent.remove(node)
+            rng.choice([inner, holder, outer]).add(node)
+        for node in nodes:
+            assert node.absolute_position == expected_position(node)
+    assert outer._origin != (0, 0) or inner._origin != (0, 0)
+
+def test_scrolling_keeps_the_cached_positions_of_the_content():
+    display = Display(200, 200, headless=True)
+    container = ScrollableContainer(width=100, height=100)
+    display.root.add(container)
+    children = [Node(x=0, y=i * 20, width=50, height=20) for i in range(50)]
+    container.add(*children)
+    positions = [child.absolute_position for child in children]
+    cached = [child._cached_position for child in children]
+    container.scroll(0, -100)
+    assert all(child._cached_position is position for child, position in zip(children, cached))
+    assert [child.absolute_position for child in children] == [(x, y - 100) for x, y in positions]
@@ -0,0 +1,103 @@
+"""
+Checks that editing a TextBuffer and re-wrapping only the edited paragraphs gives the same layout as wrapping the whole text.
+"""
+
+from random import Random
+
+import pytest
+from pygame.image import tostring as surface_to_str
+
+from ui import Display
+from ui.actions import PropertyChangeReceiver
+from ui.components import Text, EditableText
+from ui.components.buffer import TextBuffer, Offsets
+from ui.config import CONFIGURATION
+
+WORDS = "lorem ipsum dolor sit amet consectetur adipiscing elit sed do".split()
+
+@pytest.fixture(scope="module", autouse=True)
+def display():
+    return Display(300, 300, headless=True)
+
+def random_text(rng, paragraphs):
+    return "\n".join(" ".join(rng.choice(WORDS) for _ in range(rng.randint(0, 15))) for _ in range(paragraphs))
+
+def random_edit(rng, length):
+    start = rng.randint(0, length)
+    end = min(length, start + rng.choice([0, 0, 1, 3, 20]))
+    text = rng.choice(["", "x", " ", " ", "\n", "foo bar\nbaz ", " ".join(rng.choice(WORDS) for _ in range(5))])
+    return start, end, text
+
+@pytest.mark.parametrize("seed", range(3))
+def test_buffer_matches_string_edits(seed):
+    rng = Random(seed)
+    text = random_text(rng, 10)
+    buffer = TextBuffer(text)
+    for _ in range(500):
+        start, end, inserted = random_edit(rng, len(text))
+        buffer.replace(start, end, inserted)
+        text = text[:start] + inserted + text[end:]
+        assert buffer.text == text
+        assert len(buffer) == len(text)
+        assert list(buffer.starts) == list(TextBuffer(text).starts)
+        index = rng.randint(0, len(text))
+        paragraph, column = buffer.locate(index)
+        assert sum(len(p) + 1 for p in text.split("\n")[:paragraph]) + column == index
+
+@pytest.mark.parametrize("seed", range(3))
+def test_incremental_wrap_matches_full_wrap(seed):
+    rng = Random(seed)
+    node = EditableText(width=300, text=random_text(rng, 20))
+    for step in range(300):
+        node._edit(*random_edit(rng, len(node._buffer)))
+        expected = Text(width=300, restrict_width=True, text=node.text)
+        assert list(node._text_lines) == list(expected._text_lines), "lines differ after step " + str(step)
+        assert list(node._line_starts) == list(expected._line_starts)
+        assert node.height == expected.height
+
+def test_offsets_shift_and_replace():
+    rng = Random(0)
+    offsets = Offsets(range(0, 100, 5))
+    expected = list(range(0, 100, 5))
+    for _ in range(200):
+        if rng.random() < 0.5:
+            index, delta = rng.randint(0, len(expected)), rng.randint(-3, 3)
+            offsets.shift(index, delta)
+            expected[index:] = [value + delta for value in expected[index:]]
+        else:
+            start = rng.randint(0, len(expected))
+            end = rng.randint(start, min(len(expected), start + 3))
+            values = [rng.randint(0, 100) for _ in range(rng.randint(0, 3))]
+            offsets.replace(start, end, values)
+            expected[start:end] = values
+        assert list(offsets) == expected
+        assert len(offsets) == len(expected)
+
+def test_edit_reads_the_text_only_for_receivers_that_use_it():
+    node = EditableText(width=300, text="hello")
+    node._edit(5, 5, " world")
+    assert node._buffer._text == None
+    seen = []
+    node.attach_receiver(PropertyChangeReceiver("text", lambda evt, *_: seen.append(evt.value)))
+    node._edit(0, 0, ">")
+    assert seen == [">hello world"]
+
+def rendered(node) -> bytes:
+    node.draw()
+    return surface_to_str(node.surface, "RGBA")
+
+@pytest.mark.parametrize("change", [("font", CONFIGURATION["DEFAULT_FONTS"]["bold"]), ("font_size", 20), ("color", (255, 0, 0))])
+def test_line_surfaces_are_rendered_again_when_the_font_changes(change):
+    node = Text(text="hello world\nfoo bar", style={"color": (0, 0, 255)})
+    rendered(node)
+    surfaces = dict(node._line_surfaces)
+    rendered(node)
+    assert all(node._line_surfaces[line] is surfaces[line] for line in surfaces)
+    if change[0] == "color":
+        node.style["color"] = change[1]
+        expected = Text(text=node.text, style={"color": change[1]})
+    else:
+        setattr(node, *change)
+        expected = Text(text=node.text, style={"color": (0, 0, 255)}, **dict([change]))
+    assert rendered(node) == rendered(expected)
+    assert not any(node._line_surfaces[line] is surfaces[line] for line in surfaces)
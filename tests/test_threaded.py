@@ -0,0 +1,83 @@
+"""
+Checks how frames from nested apps are received, and how many more the apps are allowed to send.
+"""
+
+from io import BytesIO
+from time import sleep
+
+from ui.threaded import FrameMailbox, ThreadedDisplay, AppHost
+from ui.threaded.transport import read_event
+from ui.config import CONFIGURATION
+
+class Process(object):
+    """Stands in for a nested app's process, keeping what is written to its stdin."""
+    def __init__(self):
+        self.stdin = self
+        self.buffer = BytesIO()
+        
+    def events(self) -> list:
+        stream = BytesIO(self.buffer.getvalue())
+        found = []
+        while True:
+            evt = read_event(stream)
+            if evt == None:
+                return found
+            found.append(evt)
+
+def test_mailbox_keeps_the_newest_frame_and_counts_the_dropped_ones():
+    mailbox = FrameMailbox()
+    assert mailbox.take() == (None, 0)
+    assert mailbox.put("<@first|1>")
+    assert not mailbox.put("<@second|2>")
+    assert not mailbox.put("<@third|3>")
+    assert not mailbox.put("not a frame")
+    assert mailbox.take() == ("third", 3)
+    assert mailbox.take() == (None, 0)
+    assert mailbox.put("<@fourth|4>")
+    assert mailbox.take() == ("fourth", 1)
+    assert (mailbox.received, mailbox.taken, mailbox.dropped) == (4, 2, 2)
+
+def test_every_received_frame_is_credited_back():
+    proc = Process()
+    mailbox = FrameMailbox()
+    display = ThreadedDisplay(proc, mailbox)
+    for seq in range(3):
+        mailbox.put("<@missing|" + str(seq) + ">")
+    display._receive_frame()
+    display._receive_frame()
+    mailbox.put("<@missing|3>")
+    display._receive_frame()
+    credits = proc.events()
+    assert [evt.type for evt in credits] == [CONFIGURATION["EVENT_TYPES"]["app_frame"]] * 2
+    assert [evt.credits for evt in credits] == [3, 1]
+    assert display.frame_stats == {"received": 4, "shown": 2, "dropped": 2}
+
+APP = """
+from ui import Display, Application
+from ui.components import Node
+display = Display(40, 30)
+display.root.add(Node(x=0, y=0, width=10, height=10, style={"background_color": (255, 0, 0)}))
+Application(display, script=[[]]).launch()
+"""
+
+def test_app_host_runs_an_app_in_a_waiting_worker(tmp_path):
+    path = tmp_path / "app.py"
+    path.write_text(APP)
+    host = AppHost(workers=1, transport="stdout", compression="zlib")
+    try:
+        worker = host._idle[0]
+        proc, mailbox = host.start_app(str(path), str(tmp_path))
+        assert proc is worker
+        assert len(host._idle) == 1 and host._idle[0] is not proc
+        assert proc.wait(timeout=30) == 0
+        for _ in range(100):
+            if mailbox.received > 0:
+                break
+            sleep(0.05)
+        frame, count = mailbox.take()
+        assert count == 1
+        assert frame.get_size() == (40, 30)
+        assert frame.get_at((5, 5))[:3] == (255, 0, 0)
+        assert frame.get_at((20, 20))[:3] == (0, 0, 0)
+    finally:
+        host.close()
@@ -0,0 +1,98 @@
+"""
+Checks that frames and events survive the encodings used between nested apps and ThreadedDisplays.
+"""
+
+from io import BytesIO
+from os.path import exists
+from random import Random
+
+import pytest
+import pygame
+from pygame import Surface, Rect
+
+from ui.threaded.transport import FrameBuffer, encode_delta, apply_delta, encode_event, read_event
+from ui.config import CONFIGURATION
+
+def random_surface(rng, size) -> Surface:
+    surface = Surface(size)
+    for _ in range(20):
+        color = (rng.randint(0, 255), rng.randint(0, 255), rng.randint(0, 255))
+        surface.fill(color, (rng.randint(0, size[0]), rng.randint(0, size[1]), rng.randint(1, 30), rng.randint(1, 30)))
+    return surface
+
+def pixels(surface) -> bytes:
+    return pygame.image.tostring(surface, "RGB")
+
+def test_frame_buffer_round_trip_and_cleanup():
+    rng = Random(2)
+    writer = FrameBuffer(32, 24)
+    assert exists(writer.path)
+    reader = FrameBuffer(path=writer.path)
+    #The reader removes the file once it is mapped, so it is not left behind if either process is killed.
+    assert not exists(writer.path)
+    for _ in range(5):
+        surface = random_surface(rng, (32, 24))
+        seq = writer.write(surface, [Rect(0, 0, 32, 24)])
+        read_seq, frame = reader.read()
+        assert read_seq == seq
+        assert not reader.torn(read_seq)
+        assert pixels(frame) == pixels(surface)
+    del frame
+    reader.close()
+    writer.close()
+
+def test_unread_frame_buffer_is_removed_when_closed():
+    writer = FrameBuffer(8, 8)
+    path = writer.path
+    writer.close()
+    assert not exists(path)
+
+@pytest.mark.parametrize("encoding", ["zlib", "raw"])
+def test_delta_frames_round_trip(encoding):
+    rng = Random(0)
+    size = (64, 48)
+    frame = None
+    previous = Surface(size)
+    for _ in range(20):
+        current = previous.copy()
+        rects = []
+        for _ in range(rng.randint(0, 4)):
+            rect = Rect(rng.randint(0, 60), rng.randint(0, 44), rng.randint(0, 20), rng.randint(0, 20)).clip(current.get_rect())
+            current.blit(random_surface(rng, rect.size), rect)
+            rects.append(rect)
+        frame = apply_delta(frame, encode_delta(current, rects, encoding))
+        assert frame.get_size() == size
+        assert pixels(frame) == pixels(current)
+        previous = current
+
+def test_delta_frame_resizes():
+    frame = apply_delta(None, encode_delta(Surface((10, 10)), [Rect(0, 0, 10, 10)], "zlib"))
+    surface = random_surface(Random(1), (20, 5))
+    frame = apply_delta(frame, encode_delta(surface, [Rect(0, 0, 20, 5)], "zlib"))
+    assert pixels(frame) == pixels(surface)
+
+EVENTS = [
+    pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=(10, -20), button=1),
+    pygame.event.Event(pygame.MOUSEMOTION, pos=(3, 4), rel=(-1, 2), buttons=(1, 0, 1)),
+    pygame.event.Event(pygame.KEYDOWN, key=97, mod=1, modifiers=1, scancode=4, unicode="é"),
+    pygame.event.Event(pygame.VIDEORESIZE, size=(640, 480), w=640, h=480),
+    pygame.event.Event(pygame.TEXTINPUT, text="hello"),
+    pygame.event.Event(CONFIGURATION["EVENT_TYPES"]["app_frame"], credits=3),
+    pygame.event.Event(pygame.QUIT)
+    ]
+
+def test_events_round_trip():
+    stream = BytesIO(b"".join(encode_event(evt) for evt in EVENTS))
+    for evt in EVENTS:
+        decoded = read_event(stream)
+        assert decoded.type == evt.type
+        for attribute, value in evt.__dict__.items():
+            assert getattr(decoded, attribute) == value
+    assert read_event(stream) == None
+
+def test_unpackable_attributes_are_left_out():
+    evt = pygame.event.Event(pygame.USEREVENT, pos="not a position", key=5, custom=object())
+    decoded = read_event(BytesIO(encode_event(evt)))
+    assert decoded.key == 5
+    assert not hasattr(decoded, "pos")
+    assert not hasattr(decoded, "custom")
@@ -0,0 +1,48 @@
+"""
+Checks that a VirtualList keeps a fixed number of rows and binds them to the items in view as it scrolls.
+"""
+
+from ui import Display
+from ui.components import VirtualList, Text
+
+def visible(vlist) -> dict:
+    """Returns the text shown at each y position inside the list."""
+    return dict((row.y, row.text) for row in vlist if isinstance(row, Text) and row.y + row.height > 0 and row.y < vlist.height)
+
+def test_rows_are_reused_while_scrolling():
+    display = Display(200, 200, headless=True)
+    binds = []
+    def bind(row, item, index):
+        binds.append(index)
+        row.text = str(item)
+    vlist = VirtualList(width=200, height=100, items=["item " + str(i) for i in range(100000)], row_height=20, overscan=1, bind_row=bind)
+    display.root.add(vlist)
+    rows = set(row for row in vlist if isinstance(row, Text))
+    assert len(rows) == 100 // 20 + 2 + 2
+    assert visible(vlist) == dict((i * 20, "item " + str(i)) for i in range(5))
+    for offset in (-7, -13, -400, -35, 120, -1000000000, 5000):
+        binds.clear()
+        vlist.scroll(0, offset)
+        assert set(row for row in vlist if isinstance(row, Text)) == rows
+        first = -vlist.offsets[1] // 20
+        assert vlist.row_at(first).text == "item " + str(first)
+        assert vlist.row_at(first).y == vlist.offsets[1] + first * 20
+        assert len(binds) <= len(rows)
+        display.render()
+    vlist.scroll_to(99999)
+    assert vlist.offsets[1] == -(100000 * 20 - 100)
+    assert vlist.row_at(99999).y == 80
+    assert vlist.row_at(0) == None
+
+def test_small_scrolls_rebind_only_the_rows_that_come_into_view():
+    binds = []
+    vlist = VirtualList(width=100, height=100, items=list(range(1000)), row_height=10, overscan=2,
+                        bind_row=lambda row, item, index: binds.append(index))
+    #16 rows: the 10 in view, one partly shown at each end and 2 overscan rows above and below.
+    assert sorted(binds) == list(range(16))
+    binds.clear()
+    vlist.scroll(0, -30)
+    assert binds == [16]
+    binds.clear()
+    vlist.scroll(0, -30)
+    assert sorted(binds) == [17, 18, 19]
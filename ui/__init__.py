@@ -1,27 +1,44 @@
-from pygame import init, RESIZABLE, FULLSCREEN, VIDEORESIZE, Surface, surface
+from pygame import init, RESIZABLE, FULLSCREEN, VIDEORESIZE, SRCALPHA, Surface, surface
 from pygame.display import set_mode as set_display_mode
-from pygame.display import set_caption, flip, Info
+from pygame.display import set_caption, update as update_display, Info
 from pygame.time import Clock
 from pygame import error as pygame_error
 from pygame.image import tostring as surface_to_str
+from pygame.image import save as save_image
 from base64 import b64encode
 from sys import stdout
+from os import environ as OS_ENV_VARS
+from time import perf_counter
 
 from ui.components import RootNode
-from ui.actions import QuitReceiver, EventMonitor, EventReceiver
-from ui.threaded import is_threaded, ThreadedEventMonitor
+from ui.components.pool import POOL
+from ui.config import CONFIGURATION
+from ui.actions import QuitReceiver, EventMonitor, ScriptedEventMonitor, EventReceiver
+from ui.threaded import is_threaded, threaded_transport, frame_encoding, frame_credits, ThreadedEventMonitor
+from ui.threaded.transport import FrameBuffer, encode_delta
 
 from typing import Tuple, List
 
 class Display(object):
-    def __init__(self, width: int, height: int, title="Polaron App", resizable=True, fullscreen=False):
-        """Create a new Display."""
+    def __init__(self, width: int, height: int, title="Polaron App", resizable=True, fullscreen=False, headless=False):
+        """
+        Create a new Display.
+        If headless is True, the Display renders into an offscreen Surface instead of opening a window.
+        The SDL dummy video driver is used unless another one is set, so no display server is needed.
+        """
         self.threaded = is_threaded()
+        self.headless = headless and not self.threaded
+        if self.headless:
+            OS_ENV_VARS.setdefault("SDL_VIDEODRIVER", "dummy")
         init()
-        if not self.threaded:
-            set_caption(title)
-        else:
+        if self.threaded:
             self._last_frame = None
+            self._transport = threaded_transport()
+            self._frame_encoding = frame_encoding()
+            self._credits = frame_credits()
+            self._frames = None
+        elif not self.headless:
+            set_caption(title)
         self.title = title
         self.resizable = resizable
         self.fullscreen = fullscreen
@@ -32,21 +49,28 @@ class Display(object):
             "width": width,
             "height": height
             })
+        self._pending_size = None
         self._generate(width, height)
         self.root.attach_receiver(QuitReceiver())
         self.root.attach_receiver(EventReceiver(VIDEORESIZE, self._handle_resize))
         
     def _generate(self, w, h):
         """Generate the Pygame surface given a width and height."""
-        if not self.threaded:
+        if self.headless:
+            self.surface = Surface((w, h))
+        elif not self.threaded:
             self.surface = set_display_mode((w, h), self._flags)
         else:
             self.surface = Surface((w, h))
+            if self._transport == "shared":
+                if self._frames != None:
+                    self._frames.close()
+                self._frames = FrameBuffer(w, h)
         self.root.size = self.size
         
     def _handle_resize(self, evt):
-        """Handles VideoResize events."""
-        self.size = evt.size
+        """Handles VideoResize events. Only the last size received before a frame is applied, by layout()."""
+        self._pending_size = tuple(evt.size)
             
     @property
     def width(self) -> int:
@@ -75,20 +99,87 @@ class Display(object):
         if value != self.size:
             self._generate(value[0], value[1])
             
+    @property
+    def idle(self) -> bool:
+        """True if nothing on the display has changed or is animating."""
+        return not self.root._dirty and len(self.root._animations) == 0 and self._pending_size == None
+            
+    @property
+    def ready(self) -> bool:
+        """False while a nested app has sent as many frames as its parent allows without showing them."""
+        return not self.threaded or self._credits == None or self._credits > 0
+        
+    def add_frame_credits(self, count: int):
+        """Allow a nested app to send count more frames to its parent."""
+        if self.threaded and self._credits != None:
+            self._credits += count
+            
     def render(self):
-        """Render the display to the screen."""
-        self.root._render()
-        self.surface.blit(self.root.surface, (0, 0))
-        if not self.threaded:
-            flip()
+        """Render the areas of the display that have changed to the screen."""
+        if not self.ready:
+            return
+        self.layout()
+        self.draw()
+        self.present()
+        
+    def layout(self):
+        """Apply a pending resize and advance animated Nodes by one frame."""
+        if self._pending_size != None:
+            size = self._pending_size
+            self._pending_size = None
+            self.size = size
+        self.root.animate()
+        
+    def draw(self):
+        """Redraw the areas of the Nodes that have changed."""
+        rects = self.root._dirty_rects
+        self.root._render(rects[0].unionall(rects[1:]).clip(self.root.surface.get_rect()) if len(rects) > 0 else None)
+        POOL.recycle()
+        
+    def present(self):
+        """Copy the changed areas of the root Node to the screen."""
+        rects = [rect.clip(self.surface.get_rect()) for rect in self.root.pop_dirty_rects()]
+        if len(rects) == 0:
+            return
+        if len(rects) > CONFIGURATION["DIRTY_RECT_LIMIT"]:
+            rects = [rects[0].unionall(rects[1:])]
+        #A transparent root is shown over black; clear first so that partly transparent areas do not build up.
+        clear = (self.root.surface.get_flags() & SRCALPHA) != 0
+        for rect in rects:
+            if clear:
+                self.surface.fill((0, 0, 0), rect)
+            self.surface.blit(self.root.surface, rect, rect)
+        if self.headless:
+            return
+        elif not self.threaded:
+            update_display(rects)
         else:
-            f = surface_to_str(self.surface, "RGBA")
-            if f != self._last_frame:
-                try:
-                    stdout.write("<" + str(self.width) + "," + str(self.height) + "|" + b64encode(f).decode("ascii") + ">\n")
-                except:
-                    pass
+            if self._frames != None:
+                seq = self._frames.write(self.surface, rects)
+                line = "<@" + self._frames.path + "|" + str(seq) + ">"
+            elif self._frame_encoding != None:
+                line = encode_delta(self.surface, rects, self._frame_encoding)
+            else:
+                f = surface_to_str(self.surface, "RGBA")
+                if f == self._last_frame:
+                    return
                 self._last_frame = f
+                line = "<" + str(self.width) + "," + str(self.height) + "|" + b64encode(f).decode("ascii") + ">"
+            try:
+                stdout.write(line + "\n")
+                stdout.flush()
+            except:
+                pass
+            if self._credits != None:
+                self._credits -= 1
+        
+    def save(self, path: str):
+        """Save the current frame as an image. The format is chosen from the extension (e.g. .png)."""
+        save_image(self.surface, path)
+        
+    def frame_bytes(self, format="RGBA") -> bytes:
+        """Returns the pixels of the current frame as a raw buffer in the given format (e.g. "RGB", "RGBA")."""
+        return surface_to_str(self.surface, format)
         
     @staticmethod
     def get_system_display_size():
@@ -96,29 +187,69 @@ class Display(object):
         return (info.current_w, info.current_h)
             
 class Application(object):
-    def __init__(self, display, fps=30):
-        """The Application is the outermost control object."""
+    def __init__(self, display, fps=30, idle=False, script=None):
+        """
+        The Application is the outermost control object.
+        If idle is True, the Application sleeps until an event arrives whenever nothing on the display
+        has changed, instead of rendering at the target fps.
+        If a script is given, events are taken from it instead of Pygame (see ScriptedEventMonitor), and the Application
+        stops when it runs out. on_frame may be set to a function that is called with the Display after each frame.
+        The frame_stats property holds the time in seconds spent in each stage of the last frame,
+        and the number of Node Surfaces it copied opaquely and with alpha blending.
+        """
         self.display = display
         self.target_fps = fps
-        self.event_monitor = EventMonitor(self.display) if not self.display.threaded else ThreadedEventMonitor(self.display)
+        self.idle = idle
+        self.on_frame = None
+        if script != None:
+            self.event_monitor = ScriptedEventMonitor(self.display, script)
+        else:
+            self.event_monitor = EventMonitor(self.display) if not self.display.threaded else ThreadedEventMonitor(self.display)
+        self.frame_stats = {
+            "event_time": 0.0,
+            "layout_time": 0.0,
+            "draw_time": 0.0,
+            "present_time": 0.0,
+            "opaque_blits": 0,
+            "alpha_blits": 0
+            }
         
     def launch(self):
         """Run the application."""
         clock = Clock()
-        while self.event_monitor._monitor():
+        while True:
+            if (self.idle and self.display.idle) or not self.display.ready:
+                self.event_monitor.wait(CONFIGURATION["IDLE_WAIT_TIMEOUT"])
+            start = perf_counter()
+            if not self.event_monitor._monitor():
+                return
+            self.frame_stats["event_time"] = perf_counter() - start
             clock.tick(self.target_fps)
+            if not self.display.ready:
+                continue
             try:
-                self.display.render()
+                start = perf_counter()
+                self.display.layout()
+                self.frame_stats["layout_time"] = perf_counter() - start
+                start = perf_counter()
+                self.display.draw()
+                self.frame_stats["draw_time"] = perf_counter() - start
+                self.frame_stats["opaque_blits"], self.frame_stats["alpha_blits"] = self.display.root.pop_blit_counts()
+                start = perf_counter()
+                self.display.present()
+                self.frame_stats["present_time"] = perf_counter() - start
             except pygame_error:
                 return
+            if self.on_frame != None:
+                self.on_frame(self.display)
             
 class MultiScreenApplication(Application):
-    def __init__(self, display, fps=30, **screens):
+    def __init__(self, display, fps=30, idle=False, script=None, **screens):
         """
         An Application that has distinct Screens that display individually.
         Each screen entry should have a unique string name and Node value.
         """
-        Application.__init__(self, display, fps=fps)
+        Application.__init__(self, display, fps=fps, idle=idle, script=script)
         self.screens = screens
         
     def add_screen(self, name: str, screen):
@@ -1,6 +1,8 @@
 from pygame.event import get as get_events
+from pygame.event import wait as wait_event
 from pygame.event import event_name
 from pygame import quit as quit_pygame
+from pygame import NOEVENT
 from pygame import error as pygame_error
 from pygame.key import get_mods as get_keyboard_modifiers
 from ui.config import CONFIGURATION
@@ -9,12 +11,23 @@ class EventMonitor(object):
     def __init__(self, display):
         """The EventMonitor watches for new Pygame events and distributes them to listeners."""
         self._display = display
+        self._pending = []
+        
+    def wait(self, timeout: int):
+        """Block until an event is available or the timeout (in milliseconds) expires."""
+        try:
+            event = wait_event(timeout)
+        except pygame_error:
+            return
+        if event.type != NOEVENT:
+            self._pending.append(event)
         
     def _monitor(self):
         """Check for events."""
-        evts = []
+        evts = self._pending
+        self._pending = []
         try:
-            evts = get_events()
+            evts += get_events()
         except pygame_error:
             return False
         for event in evts:
@@ -28,6 +41,35 @@ class EventMonitor(object):
         """Find a receiver for the event."""
         self._display.root.receive_event(event)
         
+class ScriptedEventMonitor(EventMonitor):
+    def __init__(self, display, script):
+        """
+        A ScriptedEventMonitor dispatches events from a script instead of Pygame, for rendering without a user.
+        The script is an iterable with one list of events per frame. Checking for events returns False once it is exhausted.
+        Events posted to Pygame, such as app_frame events from nested apps, are dispatched before each frame's scripted events.
+        Keyboard events without a modifiers attribute take it from their mod attribute.
+        """
+        EventMonitor.__init__(self, display)
+        self._script = iter(script)
+        
+    def wait(self, timeout: int):
+        pass
+        
+    def _monitor(self):
+        try:
+            evts = self._pending + get_events() + list(next(self._script))
+        except StopIteration:
+            return False
+        except pygame_error:
+            return False
+        self._pending = []
+        for event in evts:
+            if event.type == CONFIGURATION["EVENT_TYPES"]["key_up"] or event.type == CONFIGURATION["EVENT_TYPES"]["key_down"]:
+                if not hasattr(event, "modifiers"):
+                    event.modifiers = getattr(event, "mod", 0)
+            self.dispatch(event)
+        return True
+        
         
 class EventReceiver(object):
     def __init__(self, event_types, on_receipt=None, *default, **default_kw):
@@ -80,7 +122,7 @@ class MouseReceiver(EventReceiver):
         if (EventReceiver.check(self, event) and 
             (event.type == CONFIGURATION["EVENT_TYPES"]["mouse_motion"] or event.button in buttons)):
             for node in self.nodes:
-                if node.parent == None or node in node.parent.visible_children():
+                if node.parent == None or node.parent.intersects(node):
                     abs_pos = node.absolute_position
                     if event.pos[0] >= abs_pos[0] and event.pos[0] <= abs_pos[0] + node.width:
                         if event.pos[1] >= abs_pos[1] and event.pos[1] <= abs_pos[1] + node.height:
@@ -88,6 +130,11 @@ class MouseReceiver(EventReceiver):
                             return True
         self.default_args[0] = None
         return False
+    
+    @property
+    def capturing(self) -> bool:
+        """True if the receiver needs mouse events wherever they occur, such as during a drag."""
+        return False
         
 class ClickReceiver(MouseReceiver):
     def __init__(self, on_receipt=None, *default, **default_kw):
@@ -132,6 +179,10 @@ class DragReceiver(MouseReceiver):
         self.trigger_distance = CONFIGURATION["DRAG_MIN_DISTANCE"]
         MouseReceiver.__init__(self, self._handle, *default, **default_kw)
         
+    @property
+    def capturing(self) -> bool:
+        return self._drag_state != 0
+        
     def check(self, event) -> bool:
         if self._drag_state == 0:
             return MouseReceiver.check(self, event)
@@ -181,11 +232,22 @@ class KeyboardReceiver(EventReceiver):
         return (EventReceiver.check(self, event) and self.node.focused)
     
 class PropertyChangeEvent(object):   
-    def __init__(self, prop, value):
-        """Custom event type for handling Node property changes."""
+    def __init__(self, prop, value=None, node=None):
+        """Custom event type for handling Node property changes.
+        If a node is given instead of a value, the value is read from the node the first time it is used,
+        so properties that are expensive to build (such as the text of a long EditableText) are only read if a receiver needs them.
+        """
         self.type = CONFIGURATION["EVENT_TYPES"]["property_change"]
         self.prop = prop
-        self.value = value
+        self._value = value
+        self._node = node
+        
+    @property
+    def value(self):
+        if self._node != None:
+            self._value = getattr(self._node, self.prop)
+            self._node = None
+        return self._value
     
 class PropertyChangeReceiver(EventReceiver):
     def __init__(self, prop, on_receipt=None, *default, **default_kw):
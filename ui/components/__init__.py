@@ -1,20 +1,58 @@
-from pygame import Surface, SRCALPHA
+from pygame import Surface, Rect, SRCALPHA
 from pygame.draw import rect as draw_rect
 from pygame.draw import circle as draw_circle
 from pygame.draw import polygon as draw_polygon
 from pygame.image import load as load_image
+from pygame.display import get_surface as get_display_surface
 from pygame.transform import smoothscale
 from typing import Tuple, List
+from contextlib import contextmanager
+from types import MappingProxyType
+from collections import OrderedDict
 from ui.actions import EventReceiver, DragReceiver, DragEvent, MouseReceiver,\
     ClickReceiver, KeyboardReceiver, PropertyChangeEvent, MouseScrollReveiver,\
     PropertyChangeReceiver
 from ui.components.style import Style, invert_color
+from ui.components.spatial import HitGrid
+from ui.components.metrics import METRICS
+from ui.components.buffer import TextBuffer, Offsets, Lines
+from ui.components.pool import POOL
+from bisect import bisect_left, bisect_right
 from ui.config import CONFIGURATION
 
+#Shared by Nodes without children, receivers or pending notifications, until they need a table of their own.
+_EMPTY = MappingProxyType({})
+
+def _convert_image(image: Surface) -> Surface:
+    """Returns a copy of an image in the display's pixel format, keeping per-pixel alpha if it has any."""
+    if get_display_surface() == None:
+        return image
+    return image.convert_alpha() if image.get_flags() & SRCALPHA else image.convert()
+
+def _draw_border(surface: Surface, color, rect: Rect, width: int):
+    """
+    Draw a border of the given width inside rect, as pygame.draw.rect does.
+    The edges are filled separately so that only the part inside the Surface's clip is drawn;
+    pygame.draw.rect fills the whole clip instead when it is thinner than twice the border.
+    """
+    if 2 * width >= min(rect.width, rect.height):
+        surface.fill(color, rect)
+        return
+    surface.fill(color, (rect.x, rect.y, rect.width, width))
+    surface.fill(color, (rect.x, rect.bottom - width, rect.width, width))
+    surface.fill(color, (rect.x, rect.y + width, width, rect.height - 2 * width))
+    surface.fill(color, (rect.right - width, rect.y + width, width, rect.height - 2 * width))
+
 """
 This file contains the basic visual building blocks of a Polaron app, Nodes.
 """
 
+MOUSE_EVENT_TYPES = (CONFIGURATION["EVENT_TYPES"]["mouse_down"],
+                     CONFIGURATION["EVENT_TYPES"]["mouse_up"],
+                     CONFIGURATION["EVENT_TYPES"]["mouse_motion"])
+KEY_EVENT_TYPES = (CONFIGURATION["EVENT_TYPES"]["key_down"],
+                   CONFIGURATION["EVENT_TYPES"]["key_up"])
+
 class Node(object):
     """
     A Node is the base-level component of GUIs built in Polaron.
@@ -31,34 +69,106 @@ class Node(object):
     - name: identifies the Node in a human-readable way. Can be used for styling. Default "".
     """
     
+    __slots__ = ("_children", "_style", "_dirty", "_painted", "_damage", "_animated", "_root", "_parent", "_cached_position",
+                 "receivers", "_receiver_counts", "_batch_depth", "_batched", "_x", "_y", "_width", "_height", "_name",
+                 "_visible", "_focused", "_surface", "__weakref__")
+    
+    #Nodes with their own HitGrid index their descendants relative to themselves, offset by _origin.
+    _hit_grid = None
+    _origin = (0, 0)
+    #Set by an enabled ui.profiling.Profiler, which times draws, blits and receivers through its timed method.
+    _profiler = None
+    
     def __init__(self, **data):
         """Initialize the Node."""
-        self._children = []
-        self._style = Style()
+        self._children = _EMPTY
+        self._style = Style.with_defaults(CONFIGURATION["STYLE_DEFAULTS"])
+        self._style.on_change = self._on_style_changed
+        self._dirty = True
+        self._painted = None
+        self._damage = None
+        self._surface = None
+        self._animated = False
+        self._root = None
+        self._parent = None
+        self._cached_position = None
+        self.receivers = _EMPTY
+        self._receiver_counts = _EMPTY
+        self._batch_depth = 0
+        self._batched = _EMPTY
         self.update(**data)
         
     def update(self, **data):
         """Update the Node's properties based on the data provided."""
-        self.parent = data.get("parent", None)
-        self._x = data.get("x", 0)
-        self._y = data.get("y", 0)
-        self._width = data.get("width", 0)
-        self._height = data.get("height", 0)
-        self._name = data.get("name", "")
-        self._generate(self._width, self._height)
-        self.receivers = {}
-        self.style = Style.merge_styles(Style(**CONFIGURATION["STYLE_DEFAULTS"]),
-                                        Style(**data.get("style", {})))
-        self._visible = data.get("visible", True)
-        self._focused = data.get("focused", False)
-        for recv in data.get("receivers", []):
-            self.attach_receiver(recv)
-        self.children = []
-        self.add(*data.get("children", []))
+        with self.batch_updates():
+            self.parent = data.get("parent", None)
+            self._x = data.get("x", 0)
+            self._y = data.get("y", 0)
+            self._invalidate_position()
+            self._width = data.get("width", 0)
+            self._height = data.get("height", 0)
+            self._name = data.get("name", "")
+            self._generate(self._width, self._height)
+            self._count_receivers({etype: len(value) for etype, value in self.receivers.items()}, -1)
+            self.receivers = _EMPTY
+            if self._root != None:
+                self._root._index_receivers(self)
+            self._style.reset()
+            self.style = data.get("style", {})
+            self._visible = data.get("visible", True)
+            self._focused = data.get("focused", False)
+            for recv in data.get("receivers", []):
+                self.attach_receiver(recv)
+            self.children = []
+            self.add(*data.get("children", []))
                 
     def _generate(self, w, h):
-        """Generate the Surface for the Node."""
-        self.surface = Surface((w, h), SRCALPHA)
+        """Set the size of the Node. A Surface it already has is resized from the pool, otherwise it is created the next time it is used."""
+        self._width = int(w)
+        self._height = int(h)
+        if self._surface != None:
+            self._surface = POOL.resize(self._surface, (self._width, self._height))
+        self._painted = None
+    
+    def _release_surface(self):
+        """Return the Node's Surface to the pool."""
+        if self._surface != None:
+            POOL.release(self._surface)
+            self._surface = None
+        self._painted = None
+    
+    @property
+    def surface(self) -> Surface:
+        """The Surface the Node is drawn on, created when it is first used. Opaque Nodes get a Surface without per-pixel alpha."""
+        if self._surface == None:
+            self._surface = POOL.acquire((self._width, self._height), not self.opaque)
+        return self._surface
+    
+    @surface.setter
+    def surface(self, value: Surface):
+        self._surface = value
+        self._width, self._height = value.get_size()
+        self._painted = None
+    
+    @property
+    def paints(self) -> bool:
+        """
+        False if the Node draws nothing itself: it keeps the default draw method, a transparent background and no border.
+        Such Nodes have no Surface of their own; their children are drawn straight onto the nearest ancestor that paints.
+        """
+        if type(self).draw != Node.draw or self.style["border"] > 0:
+            return True
+        background = self.style["background_color"]
+        return len(background) < 4 or background[3] > 0
+    
+    @property
+    def opaque(self) -> bool:
+        """
+        True if the Node's background is fully opaque. Its draw method then covers the whole Surface,
+        so the Surface needs no per-pixel alpha and is copied onto its parent without blending.
+        """
+        background = self.style["background_color"]
+        return len(background) < 4 or background[3] == 255
         
     @property
     def x(self) -> int:
@@ -66,7 +176,12 @@ class Node(object):
     
     @x.setter
     def x(self, value):
-        self._x = int(value)
+        if int(value) != self._x:
+            self._invalidate()
+            self._x = int(value)
+            self._invalidate_position()
+            self._invalidate()
+            self._on_bounds_changed()
         self._on_property_changed("x")
         
     @property
@@ -75,7 +190,12 @@ class Node(object):
     
     @y.setter
     def y(self, value):
-        self._y = int(value)
+        if int(value) != self._y:
+            self._invalidate()
+            self._y = int(value)
+            self._invalidate_position()
+            self._invalidate()
+            self._on_bounds_changed()
         self._on_property_changed("y")
     
     @property
@@ -86,36 +206,84 @@ class Node(object):
     def position(self, value: Tuple or List):
         if len(value) != 2:
             raise ValueError("Position must be in the form (x, y)")
-        self.x, self.y = tuple(value)
-        self._on_property_changed("position")
+        with self.batch_updates():
+            self.x, self.y = tuple(value)
+            self._on_property_changed("position")
+        
+    @property
+    def parent(self) -> "Node" or None:
+        return self._parent
+    
+    @parent.setter
+    def parent(self, value: "Node" or None):
+        if value != self._parent:
+            self._parent = value
+            self._invalidate_position()
         
     @property
     def absolute_position(self) -> Tuple[int]:
-        if self.parent == None:
-            return self.position
-        parent_abs = self.parent.absolute_position
-        return (self.x + parent_abs[0], self.y + parent_abs[1])
+        scope, x, y = self._scoped_position()
+        while scope != None:
+            outer, scope_x, scope_y = scope._scoped_position()
+            x += scope_x + scope._origin[0]
+            y += scope_y + scope._origin[1]
+            scope = outer
+        return (x, y)
+    
+    def _scoped_position(self) -> tuple:
+        """
+        Returns the tuple (scope, x, y): the position of the Node relative to the content of the nearest ancestor that scrolls it,
+        or to the screen if scope is None. Only this position is cached, so scrolling does not invalidate the cache of the content.
+        """
+        if self._cached_position == None:
+            parent = self._parent
+            if parent == None:
+                self._cached_position = (None, self._x, self._y)
+            elif parent._scrolls(self):
+                self._cached_position = (parent, self._x, self._y)
+            else:
+                scope, x, y = parent._scoped_position()
+                self._cached_position = (scope, x + self._x, y + self._y)
+        return self._cached_position
+    
+    @property
+    def absolute_rect(self) -> Rect:
+        """The bounds of the Node in screen coordinates."""
+        pos = self.absolute_position
+        return Rect(pos[0], pos[1], self.width, self.height)
+    
+    def _invalidate_position(self):
+        """Clear the cached positions of this Node and of the descendants it is not scrolling."""
+        if self._cached_position == None:
+            return
+        self._cached_position = None
+        for child in self:
+            child._invalidate_position()
     
     @property
     def width(self):
-        return self.surface.get_width()
+        return self._width
     
     @width.setter
     def width(self, value: int):
         if value != self.width:
+            self._invalidate()
             self._width = int(value)
             self._generate(self._width, self.height)
+            self._on_bounds_changed()
             self._on_property_changed("width")
         
     @property
     def height(self):
-        return self.surface.get_height()
+        return self._height
     
     @height.setter
     def height(self, value: int):
         if value != self.height:
+            self._invalidate()
             self._height = int(value)
             self._generate(self.width, self._height)
+            self._on_bounds_changed()
             self._on_property_changed("height")
             
     @property
@@ -125,18 +293,29 @@ class Node(object):
     @size.setter
     def size(self, value: Tuple[int] or List[int]):
         if value != self.size:
-            self._generate(value[0], value[1])
+            old = self.size
+            with self.batch_updates():
+                self._invalidate()
+                self._width = int(value[0])
+                self._height = int(value[1])
+                self._generate(self._width, self._height)
+                self._on_bounds_changed()
+                if self.width != old[0]:
+                    self._on_property_changed("width")
+                if self.height != old[1]:
+                    self._on_property_changed("height")
+                self._on_property_changed("size")
     
     @property
     def children(self) -> List["Node"]:
-        return self._children
+        """A list of the child Nodes, in the order they are drawn (bottom first). Changing the list does not change the children."""
+        return list(self._children)
     
     @children.setter
     def children(self, value: Tuple["Node"] or List["Node"]):
-        self.clear()
-        for node in value:
-            self.add_child(node)
-        self._on_property_changed("children")
+        with self.batch_updates():
+            self.clear()
+            self.add(*value)
             
     @property
     def style(self):
@@ -156,7 +335,9 @@ class Node(object):
     
     @visible.setter
     def visible(self, value: bool):
-        self._visible = value
+        if value != self._visible:
+            self._visible = value
+            self._invalidate()
         self._on_property_changed("visible")
             
     @property
@@ -167,11 +348,11 @@ class Node(object):
     def focused(self, value: bool):
         if value != self._focused:
             self._focused = value
-            if self.parent != None:
+            if self._root != None:
                 if value == True:
-                    self.root_node().focused_node = self
-                elif value == False and self.root_node().focused_node == self:
-                    self.root_node().focused_node = None
+                    self._root.focused_node = self
+                elif value == False and self._root.focused_node == self:
+                    self._root.focused_node = None
             self._on_property_changed("focused")
             
     @property
@@ -184,54 +365,237 @@ class Node(object):
             self._name = value
             self._on_property_changed("name")
             
+    @property
+    def animated(self):
+        return self._animated
+    
+    @animated.setter
+    def animated(self, value: bool):
+        if value != self._animated:
+            self._animated = value
+            if self._root != None:
+                if value:
+                    self._root._animations[self] = None
+                else:
+                    self._root._animations.pop(self, None)
+            
     def __contains__(self, value):
         return value in self._children
     
     def __iter__(self):
-        return iter(self._children)
+        return iter(tuple(self._children))
     
     def __str__(self):
         return str(self.__class__) + " in (" + str(self.parent) + ") at " + str(self.position)
     
     def _on_property_changed(self, prop: str):
-        """Call the appropriate event listener when a Node property is changed."""
-        if hasattr(self, prop):
-            self.receive_event(PropertyChangeEvent(prop, getattr(self, prop)))
+        """Notify this Node's PropertyChangeReceivers when one of its properties is changed."""
+        if prop not in CONFIGURATION["UNPAINTED_PROPERTIES"]:
+            self.mark_dirty()
+        if self._batch_depth > 0:
+            if self._batched is _EMPTY:
+                self._batched = {}
+            self._batched[prop] = None
+        #Subclasses without __slots__ may notify changes to plain instance attributes too.
+        elif self.receivers.get(CONFIGURATION["EVENT_TYPES"]["property_change"]) and (hasattr(type(self), prop) or prop in getattr(self, "__dict__", ())):
+            self._notify_receivers(PropertyChangeEvent(prop, node=self))
+            
+    @contextmanager
+    def batch_updates(self):
+        """
+        Hold property change notifications until the end of the block.
+        Each changed property is then notified once, with its final value.
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                batched = self._batched
+                self._batched = _EMPTY
+                for prop in batched:
+                    self._on_property_changed(prop)
+            
+    def _on_style_changed(self, attribute: str):
+        """Redraw the Node when one of its styling attributes is changed."""
+        if attribute == "background_color" and self._surface != None and ((self._surface.get_flags() & SRCALPHA) == 0) != self.opaque:
+            self._release_surface()
+        self.mark_dirty()
+        
+    def mark_dirty(self):
+        """Flag the Node to be redrawn on the next frame."""
+        self._dirty = True
+        self._painted = None
+        self._invalidate()
+        
+    def _invalidate(self):
+        """
+        Flag the ancestors of this Node for compositing and record the area it covers as changed.
+        Each ancestor adds the area, in its own coordinates, to its _damage; only that part of it is composited again.
+        """
+        if self.parent == None:
+            node = self
+            rect = Rect(0, 0, self.width, self.height)
+        else:
+            node = self.parent
+            rect = Rect(node._child_position(self), (self.width, self.height))
+        while True:
+            rect = rect.clip(0, 0, node.width, node.height)
+            if rect.width == 0 or rect.height == 0:
+                return
+            node._dirty = True
+            node._damage = rect.copy() if node._damage == None else node._damage.union(rect)
+            if node.parent == None:
+                break
+            rect.move_ip(node.parent._child_position(node))
+            node = node.parent
+        if isinstance(node, RootNode):
+            #A resize invalidates the same area several times; only keep the largest of consecutive nested rects.
+            rects = node._dirty_rects
+            if len(rects) > 0 and rects[-1].contains(rect):
+                return
+            while len(rects) > 0 and rect.contains(rects[-1]):
+                rects.pop()
+            rects.append(rect)
     
     def _on_add(self, parent: "Node"):
         """Generate the Surface when added to a Node and register parent node."""
         self.parent = parent
+        
+    def _on_attach(self, root: "RootNode"):
+        """Register this Node and its children with the RootNode of the tree they were added to."""
+        self._root = root
+        if self._focused and root._focused_node != self:
+            root.focused_node = self
+        if self._animated:
+            root._animations[self] = None
+        root._index_receivers(self)
+        for child in self:
+            child._on_attach(root)
             
+    def _on_detach(self, root: "RootNode"):
+        """Unregister this Node and its children from the RootNode of the tree they were removed from."""
+        self._root = None
+        if root._focused_node == self:
+            root._focused_node = None
+        root._animations.pop(self, None)
+        root._unindex(self)
+        for child in self:
+            child._on_detach(root)
+            
+    def _on_bounds_changed(self):
+        """Flag the Node's subtree for re-indexing after it was moved or resized."""
+        if self.parent != None:
+            self.parent._on_child_bounds_changed(self)
+        if self._root != None:
+            self._root._hit_stale[self] = None
+            
+    def _on_child_bounds_changed(self, child: "Node"):
+        """Called when a child is moved or resized."""
+        pass
+    
+    def _child_position(self, child: "Node") -> Tuple[int]:
+        """Returns the position at which a child is drawn on this Node's Surface."""
+        return (child._x, child._y)
+    
+    def _scrolls(self, child: "Node") -> bool:
+        """Returns True if the child moves with this Node's _origin, so its position is cached relative to it."""
+        return False
+    
+    def _adopt(self, node: "Node"):
+        """Register a Node that was just put in the children of this Node."""
+        node._on_add(self)
+        self._count_receivers(node._receiver_counts)
+        node._invalidate()
+        if self._root != None:
+            node._on_attach(self._root)
+    
     def add(self, *nodes: "Node"):
-        """Add Node(s) as a child of this Node."""
+        """Add Node(s) as a child of this Node, above the existing children."""
         for node in nodes:
-            if node in self:
+            if node in self._children:
                 raise ValueError("The node " + str(node) + " is already a child of " + str(self))
-            self._children.append(node)
-            node._on_add(self)
+            if self._children is _EMPTY:
+                self._children = OrderedDict()
+            #Each child maps to its drawing order, so siblings can be ordered without searching the list.
+            self._children[node] = next(reversed(self._children.values()), -1) + 1
+            self._adopt(node)
+        self._on_property_changed("children")
+    
+    def insert(self, index: int, *nodes: "Node"):
+        """Add Node(s) as children of this Node at a position in the drawing order, as with list.insert. This renumbers the children."""
+        order = list(self._children)
+        seen = {}
+        for node in nodes:
+            if node in self._children or node in seen:
+                raise ValueError("The node " + str(node) + " is already a child of " + str(self))
+            seen[node] = None
+        order[index:index] = nodes
+        self._children = OrderedDict((node, i) for i, node in enumerate(order))
+        for node in nodes:
+            self._adopt(node)
         self._on_property_changed("children")
             
     def remove(self, *nodes: "Node"):
-        """Remove children from this Node."""
+        """Remove children from this Node. Nodes that are not children are ignored."""
         for child in nodes:
-            if child not in self:
-                return
+            if child not in self._children:
+                continue
+            child._invalidate()
+            if self._root != None:
+                child._on_detach(self._root)
+            self._count_receivers(child._receiver_counts, -1)
             child.parent = None
-            self._children.remove(child)
+            del self._children[child]
         self._on_property_changed("children")
         
     def clear(self):
         """Remove all child Nodes."""
         for child in self:
+            child._invalidate()
+            if self._root != None:
+                child._on_detach(self._root)
+            self._count_receivers(child._receiver_counts, -1)
             child.parent = None
-        self._children = []
+        self._children = _EMPTY
         self._on_property_changed("children")
         
-    def visible_children(self) -> List["Node"]:
-        """Returns a list of child Nodes that are visible within this Node."""
+    def raise_child(self, node: "Node"):
+        """Draw a child above all of its siblings."""
+        if node not in self._children:
+            raise ValueError("The node " + str(node) + " is not a child of " + str(self))
+        top = next(reversed(self._children.values()))
+        if self._children[node] != top:
+            self._children[node] = top + 1
+            self._children.move_to_end(node)
+            if self._root != None:
+                self._root._dispatch_orders.clear()
+            node._invalidate()
+            self._on_property_changed("children")
+    
+    def lower_child(self, node: "Node"):
+        """Draw a child below all of its siblings."""
+        if node not in self._children:
+            raise ValueError("The node " + str(node) + " is not a child of " + str(self))
+        bottom = next(iter(self._children.values()))
+        if self._children[node] != bottom:
+            self._children[node] = bottom - 1
+            self._children.move_to_end(node, last=False)
+            if self._root != None:
+                self._root._dispatch_orders.clear()
+            node._invalidate()
+            self._on_property_changed("children")
+    
+    def visible_children(self, area: Rect = None) -> List["Node"]:
+        """Returns a list of child Nodes that are visible within this Node, or within an area of it."""
+        if area == None:
+            area = Rect(0, 0, self.width, self.height)
         visible = []
         for child in self:
-            if self.intersects(child):
+            pos = self._child_position(child)
+            if (pos[0] <= area.right and area.left <= pos[0] + child.width and
+                pos[1] <= area.bottom and area.top <= pos[1] + child.height):
                 visible.append(child)
         return visible
     
@@ -261,32 +625,61 @@ class Node(object):
                 raise ValueError("The receiver " + str(receiver) + " is already attached.")
             else:
                 receiver.nodes.append(self)
+                if self.receivers is _EMPTY:
+                    self.receivers = {}
                 if etype not in self.receivers:
                     self.receivers[etype] = []
                 self.receivers[etype].append(receiver)
+                self._count_receivers({etype: 1})
+        if self._root != None:
+            self._root._index_receivers(self)
     
     def detach_receiver(self, receiver):
         """Detach a receiver by value or event type(s)."""
         if isinstance(receiver, EventReceiver):
-            for _, value in self.receivers.items():
+            for etype, value in self.receivers.items():
                 if receiver in value:
                     receiver.nodes.remove(self)
                     value.remove(receiver)
-            
+                    self._count_receivers({etype: 1}, -1)
+            if self._root != None:
+                self._root._index_receivers(self)
+                
+    def _count_receivers(self, counts: dict, sign=1):
+        """Add per-event-type receiver counts to this Node and its ancestors."""
+        if len(counts) == 0:
+            return
+        node = self
+        while node != None:
+            if node._receiver_counts is _EMPTY:
+                node._receiver_counts = {}
+            for etype, count in counts.items():
+                node._receiver_counts[etype] = node._receiver_counts.get(etype, 0) + (sign * count)
+            node = node.parent
                 
     def get_receivers(self, evt_type) -> EventReceiver or None:
         """Returns the receivers for the specified event type, if it exists."""
         return self.receivers.get(evt_type, None)
     
     def receive_event(self, event) -> bool:
-        """Checks self and all children and returns True if an event was received at any level."""
+        """Checks self and all children and returns True if an event was received at any level.
+        Subtrees without receivers for the event type are skipped."""
         for child in self:
+            if child._receiver_counts.get(event.type, 0) == 0:
+                continue
             if child.receive_event(event) and not event.type in CONFIGURATION["PERMEABLE_EVENT_TYPES"]:
                 return True
+        return self._notify_receivers(event)
+    
+    def _notify_receivers(self, event) -> bool:
+        """Pass an event to this Node's own receivers."""
         if self.get_receivers(event.type) != None:
             received = False
             for receiver in self.get_receivers(event.type):
-                if receiver.receive(event):
+                if Node._profiler == None:
+                    if receiver.receive(event):
+                        received = True
+                elif Node._profiler.timed(self, receiver, receiver.receive, event):
                     received = True
             if received != True and not event.type in CONFIGURATION["PERMEABLE_EVENT_TYPES"]:
                 return received
@@ -298,25 +691,89 @@ class Node(object):
         self.surface.fill(self.style["background_color"])
         #border
         if self.style["border"] > 0:
-            draw_rect(self.surface, self.style["border_color"],
-                      [0, 0, self.width, self.height],
-                      self.style["border"])
-    
-    def _render(self):
-        """Render the node on its parent's Surface."""
-        if not self.visible: return
+            _draw_border(self.surface, self.style["border_color"], Rect(0, 0, self.width, self.height), self.style["border"])
+    
+    def tick(self):
+        """Called once per frame while the Node is animated. Call mark_dirty to redraw."""
+        pass
+    
+    def _render(self, area: Rect = None):
+        """
+        Bring the area given of the Node's Surface, in the Node's own coordinates, up to date (default the whole Node).
+        If the Node was drawn over the area before, only the part of it that was damaged since is drawn again;
+        children outside the part drawn are neither rendered nor blitted.
+        """
+        if area == None:
+            area = Rect(0, 0, self._width, self._height)
+        if self._painted != None and self._painted.contains(area):
+            if self._damage == None:
+                self._dirty = False
+                return
+            redraw = self._damage.clip(area)
+            if area.contains(self._damage):
+                self._damage = None
+            self._dirty = self._damage != None
+            if redraw.width == 0 or redraw.height == 0: return
+        else:
+            redraw = area
+            self._painted = area
+            self._damage = None
+            self._dirty = False
+        clipped = redraw.size != (self._width, self._height)
+        if clipped:
+            self.surface.set_clip(redraw)
         
-        self.draw()
+        #Nothing below an opaque child that covers the whole area can be seen, so it is not drawn.
+        nodes = self.visible_children(redraw)
+        covered = False
+        for i in range(len(nodes) - 1, -1, -1):
+            node = nodes[i]
+            if node.visible and node.opaque and node.paints and Rect(self._child_position(node), node.size).contains(redraw):
+                nodes = nodes[i:]
+                covered = True
+                break
+        if not covered:
+            if Node._profiler == None:
+                self.draw()
+            else:
+                Node._profiler.timed(self, "draw", self.draw)
+        self._composite_children(self.surface, (0, 0), redraw, nodes)
         
-        for node in self.visible_children():
+        if clipped:
+            self.surface.set_clip(None)
+    
+    def _composite_children(self, surface: Surface, offset: Tuple[int], area: Rect, nodes: List["Node"] = None):
+        """
+        Render the visible children (or the children given) and blit them onto a Surface on which this Node is at offset,
+        within area of the Surface. The children of Nodes that do not paint are composited onto the same Surface.
+        """
+        if nodes == None:
+            nodes = self.visible_children(area.move(-offset[0], -offset[1]))
+        for node in nodes:
+            if not node.visible: continue
             try:
-                node._render()
+                pos = self._child_position(node)
+                pos = (pos[0] + offset[0], pos[1] + offset[1])
+                shown = area.clip(Rect(pos, (node.width, node.height)))
+                if shown.width == 0 or shown.height == 0: continue
+                if node.paints:
+                    inner = shown.move(-pos[0], -pos[1])
+                    node._render(inner)
+                    if Node._profiler == None:
+                        surface.blit(node.surface, shown, inner)
+                    else:
+                        Node._profiler.timed(self, "blit", surface.blit, node.surface, shown, inner)
+                    if self._root != None:
+                        self._root._blit_counts[1 if node._surface.get_flags() & SRCALPHA else 0] += 1
+                else:
+                    node._dirty = False
+                    node._damage = None
+                    node._release_surface()
+                    node._composite_children(surface, pos, shown)
             except:
                 self.remove(node)
                 print(str(node) + " failed to render and was removed.")
                 __import__("traceback").print_exc()
-        if self.parent != None:
-            self.parent.surface.blit(self.surface, self.position)
             
 class RootNode(Node):
     """
@@ -326,10 +783,240 @@ class RootNode(Node):
     - Node parameters.
     """
     
+    __slots__ = ("_dirty_rects", "_animations", "_hit_grid", "_hit_indexed", "_hit_scopes", "_hit_targets", "_hit_stale", "_mouse_listeners",
+                 "_mouse_captures", "_receivers_by_type", "_dispatch_orders", "_key_listeners", "_key_holders", "_key_targets",
+                 "_blit_counts", "_focused_node")
+    
     def __init__(self, **data):
+        self._dirty_rects = []
+        self._animations = {}
+        self._hit_grid = HitGrid(CONFIGURATION["HIT_GRID_CELL_SIZE"])
+        self._hit_indexed = {}
+        self._hit_scopes = {}
+        self._hit_targets = {}
+        self._hit_stale = {}
+        self._mouse_listeners = {}
+        self._mouse_captures = {}
+        self._receivers_by_type = {}
+        self._dispatch_orders = {}
+        self._key_listeners = {}
+        self._key_holders = {}
+        self._key_targets = {}
+        self._blit_counts = [0, 0]
         Node.__init__(self, **data)
         self._focused_node = None
+        self._on_attach(self)
+        
+    def _index_receivers(self, node: Node):
+        """Track the Node for event routing according to the receivers attached to it."""
+        positional = False
+        listener = False
+        key_listener = False
+        key_targets = {}
+        self._dispatch_orders.clear()
+        for etype, receivers in node.receivers.items():
+            if etype not in self._receivers_by_type:
+                self._receivers_by_type[etype] = {}
+            if len(receivers) > 0:
+                self._receivers_by_type[etype][node] = None
+            else:
+                self._receivers_by_type[etype].pop(node, None)
+            if etype in MOUSE_EVENT_TYPES:
+                for receiver in receivers:
+                    if isinstance(receiver, MouseReceiver):
+                        positional = True
+                    else:
+                        listener = True
+            elif etype in KEY_EVENT_TYPES:
+                for receiver in receivers:
+                    if isinstance(receiver, KeyboardReceiver):
+                        key_targets[receiver.node] = None
+                    else:
+                        key_listener = True
+        self._index_keyboard(node, tuple(key_targets))
+        if key_listener:
+            self._key_listeners[node] = None
+        else:
+            self._key_listeners.pop(node, None)
+        if positional:
+            self._hit_targets[node] = None
+        else:
+            self._hit_targets.pop(node, None)
+        if positional or (node._hit_grid != None and node != self):
+            if node not in self._hit_indexed:
+                self._hit_indexed[node] = None
+            self._hit_stale[node] = None
+        else:
+            self._unindex_hit(node)
+        if listener:
+            self._mouse_listeners[node] = None
+        else:
+            self._mouse_listeners.pop(node, None)
+            
+    def _unindex(self, node: Node):
+        """Stop tracking the Node for event routing."""
+        self._dispatch_orders.clear()
+        for nodes in self._receivers_by_type.values():
+            nodes.pop(node, None)
+        self._index_keyboard(node, ())
+        self._key_listeners.pop(node, None)
+        self._unindex_hit(node)
+        self._hit_scopes.pop(node, None)
+        self._hit_targets.pop(node, None)
+        self._hit_stale.pop(node, None)
+        self._mouse_listeners.pop(node, None)
+        self._mouse_captures.pop(node, None)
+        
+    def _index_keyboard(self, node: Node, targets: tuple):
+        """Record that the Node has KeyboardReceivers for the target Nodes, which receive key events while their target has focus."""
+        for target in self._key_targets.pop(node, ()):
+            holders = self._key_holders[target]
+            holders.pop(node, None)
+            if len(holders) == 0:
+                del self._key_holders[target]
+        if len(targets) > 0:
+            self._key_targets[node] = targets
+            for target in targets:
+                self._key_holders.setdefault(target, {})[node] = None
         
+    def _unindex_hit(self, node: Node):
+        """Remove the Node's hit-test box from the HitGrid it is in."""
+        scope = self._hit_indexed.pop(node, None)
+        if scope != None:
+            scope._hit_grid.remove(node)
+            self._hit_scopes.get(scope, {}).pop(node, None)
+    
+    @staticmethod
+    def _hit_scope(node: Node) -> tuple:
+        """
+        Returns the tuple (scope, rect): the nearest ancestor with its own HitGrid and the bounds of the Node relative to it.
+        The bounds do not include the scope's _origin, so scrolling a scope does not move the boxes inside it.
+        """
+        if node.parent == None:
+            return (node, Rect(0, 0, node.width, node.height))
+        x, y = 0, 0
+        child = node
+        while True:
+            parent = child.parent
+            pos = parent._child_position(child)
+            x += pos[0]
+            y += pos[1]
+            if parent._hit_grid != None:
+                return (parent, Rect(x - parent._origin[0], y - parent._origin[1], node.width, node.height))
+            child = parent
+    
+    def _reindex(self, node: Node):
+        """Update the hit-test boxes of the indexed Nodes in a subtree, down to the Nodes with their own HitGrid."""
+        if node in self._hit_indexed:
+            scope, rect = RootNode._hit_scope(node)
+            if self._hit_indexed[node] not in (None, scope):
+                self._hit_indexed[node]._hit_grid.remove(node)
+                self._hit_scopes.get(self._hit_indexed[node], {}).pop(node, None)
+            scope._hit_grid.update(node, rect)
+            self._hit_indexed[node] = scope
+            if node._hit_grid != None:
+                self._hit_scopes.setdefault(scope, {})[node] = None
+        if node._hit_grid == None:
+            for child in node:
+                self._reindex(child)
+    
+    def _query_hits(self, scope: Node, pos: Tuple[int], found: List[Node]):
+        """
+        Add the Nodes with mouse receivers under a position in a scope's coordinates to found, searching nested scopes.
+        Every nested scope is searched, not only those under the position, since their contents can extend past their bounds.
+        """
+        for node in scope._hit_grid.query(pos):
+            if node in self._hit_targets:
+                found.append(node)
+        for node in self._hit_scopes.get(scope, _EMPTY):
+            rect = scope._hit_grid.rect(node)
+            self._query_hits(node, (pos[0] - rect.x - node._origin[0], pos[1] - rect.y - node._origin[1]), found)
+            
+    def nodes_at(self, pos: Tuple[int] or List[int]) -> List[Node]:
+        """Returns the Nodes with mouse receivers whose bounds contain the position."""
+        stale = self._hit_stale
+        self._hit_stale = {}
+        for node in stale:
+            if node._root == self:
+                self._reindex(node)
+        found = []
+        self._query_hits(self, (pos[0] - self.x, pos[1] - self.y), found)
+        return found
+    
+    @staticmethod
+    def _dispatch_order(node: Node) -> List[int]:
+        """Sort key placing Nodes in the order a depth-first event walk visits them (children before parents)."""
+        key = [float("inf")]
+        while node.parent != None:
+            key.append(node.parent._children[node])
+            node = node.parent
+        key.reverse()
+        return key
+    
+    def receivers_for(self, evt_type) -> List[Node]:
+        """Returns the Nodes in the tree with receivers for the event type."""
+        return list(self._receivers_by_type.get(evt_type, {}))
+    
+    def _ordered_receivers(self, evt_type) -> List[Node]:
+        """
+        Returns the Nodes with receivers for the event type in dispatch order.
+        The order is kept until receivers are attached or detached or the tree is changed.
+        """
+        order = self._dispatch_orders.get(evt_type, None)
+        if order == None:
+            order = sorted(self._receivers_by_type.get(evt_type, {}), key=RootNode._dispatch_order)
+            self._dispatch_orders[evt_type] = order
+        return order
+    
+    def receive_event(self, event) -> bool:
+        """
+        Route an event straight to the Nodes with receivers for its type.
+        Mouse events only go to the Nodes under the cursor, and keyboard events only go to the KeyboardReceivers
+        of the focused Node and to other receivers of key events.
+        Nodes are visited in depth-first order, children before parents.
+        """
+        if event.type in KEY_EVENT_TYPES:
+            candidates = dict(self._key_holders.get(self._focused_node, _EMPTY)) if self._focused_node != None else {}
+            candidates.update(self._key_listeners)
+            for node in sorted(candidates, key=RootNode._dispatch_order) if len(candidates) > 1 else candidates:
+                if node._root == self:
+                    node._notify_receivers(event)
+            return False
+        if event.type not in MOUSE_EVENT_TYPES:
+            for node in self._ordered_receivers(event.type):
+                if node._root == self:
+                    node._notify_receivers(event)
+            return False
+        candidates = dict.fromkeys(self.nodes_at(event.pos))
+        candidates.update(self._mouse_listeners)
+        candidates.update(self._mouse_captures)
+        self._mouse_captures = {}
+        for node in sorted(candidates, key=RootNode._dispatch_order):
+            if node._root != self:
+                continue
+            node._notify_receivers(event)
+            for receiver in node.receivers.get(event.type, []):
+                if isinstance(receiver, MouseReceiver) and receiver.capturing:
+                    self._mouse_captures[node] = None
+        return False
+        
+    def animate(self):
+        """Advance every animated Node in the tree by one frame."""
+        for node in list(self._animations):
+            node.tick()
+            
+    def pop_dirty_rects(self) -> List[Rect]:
+        """Returns the screen areas changed since the last call and resets them."""
+        rects = self._dirty_rects
+        self._dirty_rects = []
+        return rects
+        
+    def pop_blit_counts(self) -> Tuple[int]:
+        """Returns the tuple (opaque, alpha): the number of opaque and alpha-blended blits since the last call, and resets them."""
+        counts = self._blit_counts
+        self._blit_counts = [0, 0]
+        return tuple(counts)
+    
     @property
     def focused_node(self):
         return self._focused_node
@@ -353,24 +1040,29 @@ class Text(Node):
     - restrict_width: if True, text will be wrapped to fit in the Node's width. Default False.
     - restrict_height: if True, the Node will not be resized vertically to fit the text. Default False.
     """
+    
+    __slots__ = ("_buffer", "_font", "_font_size", "_line_spacing", "_restrict_width", "_restrict_height", "_line_surfaces",
+                 "_line_surfaces_key", "_wrapped", "_text_lines", "_line_starts", "_text_height")
         
     def update(self, **data):
         Node.update(self, **data)
-        self._text = data.get("text", "")
+        self._buffer = TextBuffer(data.get("text", ""))
         self._font = data.get("font", CONFIGURATION["DEFAULT_FONTS"]["regular"])
         self._font_size = data.get("font_size", 12)
         self._line_spacing = data.get("line_spacing", 2)
         self._restrict_width = data.get("restrict_width", False)
         self._restrict_height = data.get("restrict_height", False)
+        self._line_surfaces = {}
+        self._line_surfaces_key = None
         self._fit_text()
         
     @property
     def text(self):
-        return self._text
+        return self._buffer.text
     
     @text.setter
     def text(self, value):
-        self._text = str(value).replace("\r\n", "\n")
+        self._buffer = TextBuffer(str(value).replace("\r\n", "\n"))
         self._fit_text()
         self._on_property_changed("text")
         
@@ -401,7 +1093,7 @@ class Text(Node):
     @line_spacing.setter
     def line_spacing(self, value: int):
         self._line_spacing = int(value)
-        self._calculate()
+        self._fit_text()
         self._on_property_changed("line_spacing")
         
     @property
@@ -424,67 +1116,113 @@ class Text(Node):
         self._fit_text()
         self._on_property_changed("restrict_height")
         
+    def _wrap(self, paragraph: str) -> List[str]:
+        """Returns the lines a paragraph is broken into."""
+        words = paragraph.split(" ")
+        lines = []
+        total_width = 0
+        new_line = ""
+        for w in range(len(words)):
+            word_width = METRICS.width(self.font, words[w] + " ", self.font_size)
+            total_width += word_width
+            if self.restrict_width:
+                if word_width > self.width:
+                    self.text = ""
+                    raise ValueError("A word does not fit in the bounds provided.")
+                if total_width > self.width:
+                    lines.append(new_line[:-1])
+                    new_line = ""
+                    total_width = word_width
+            elif w == len(words) - 1:
+                self.width = total_width
+            new_line += words[w] + " "
+        lines.append(new_line[:-1])
+        return lines
+    
+    def _place_lines(self, first: int, count: int, y: int):
+        """Returns the lines, their y positions, their starting indices in the text and the height reached for count paragraphs from first."""
+        lines = []
+        positions = []
+        starts = []
+        for p in range(first, first + count):
+            index = self._buffer.starts[p]
+            for line in self._wrapped[p]:
+                lines.append(line)
+                positions.append(y)
+                starts.append(index)
+                y += METRICS.measure(self.font, line, self.font_size)[1] + self.line_spacing
+                index += len(line) + 1
+        return lines, positions, starts, y
+    
     def _fit_text(self):
-        lines = self._text.split("\n")
-        new_lines = []
-        l = 0
-        for line in lines:
-            words = line.split(" ")
-            total_width = 0
-            w = 0
-            new_line = ""
-            for word in words:
-                word_width = self.font.get_rect(word + " ", size=self.font_size).width
-                total_width += word_width
-                if self.restrict_width:
-                    if word_width > self.width:
-                        self.text = ""
-                        raise ValueError("A word does not fit in the bounds provided.")
-                    if total_width > self.width:
-                        new_txt = ""
-                        for wrd in words[w:]:
-                            new_txt += wrd + " "
-                        if l == len(lines) - 1:
-                            lines.append(new_txt[:-1])
-                        else:
-                            lines[l + 1] = new_txt + " " + lines[l + 1]
-                        break
-                elif w == len(words) - 1:
-                    self.width = total_width
-                new_line += word + " "
-                w += 1
-            new_lines.append(new_line[:-1])
-            l += 1
-        
-        total_height = 0
-        self._text_lines = []
-        for line in new_lines:
-            self._text_lines.append((line, total_height))
-            total_height += self.font.get_rect(line, size=self.font_size).height + self.line_spacing
+        self._wrapped = [self._wrap(paragraph) for paragraph in self._buffer.paragraphs]
+        lines, positions, starts, self._text_height = self._place_lines(0, len(self._wrapped), 0)
+        self._text_lines = Lines(lines, Offsets(positions))
+        self._line_starts = Offsets(starts)
+        if not self.restrict_height:
+            self.height = self._text_height
             
+    def _refit_text(self, first: int, removed: int, inserted: int):
+        """
+        Update the layout after the buffer replaced removed paragraphs from first with inserted new ones.
+        Only the new paragraphs are wrapped again; the positions of the lines after them are shifted lazily (see Offsets).
+        """
+        if not self.restrict_width:
+            self._fit_text()
+            return
+        first_line = bisect_left(self._line_starts, self._buffer.starts[first])
+        old_end = first_line
+        for lines in self._wrapped[first:first + removed]:
+            old_end += len(lines)
+        self._wrapped[first:first + removed] = [self._wrap(paragraph) for paragraph in self._buffer.paragraphs[first:first + inserted]]
+        positions = self._text_lines.positions
+        lines, new_positions, starts, y = self._place_lines(first, inserted, positions[first_line])
+        
+        if old_end < len(positions):
+            dy = y - positions[old_end]
+            di = self._buffer.starts[first + inserted] - self._line_starts[old_end]
+        else:
+            dy = y - self._text_height
+            di = 0
+        self._text_lines.texts[first_line:old_end] = lines
+        positions.replace(first_line, old_end, new_positions)
+        positions.shift(first_line + len(lines), dy)
+        self._line_starts.replace(first_line, old_end, starts)
+        self._line_starts.shift(first_line + len(lines), di)
+        self._text_height += dy
         if not self.restrict_height:
-            self.height = total_height
+            self.height = self._text_height
+        
+    def _line_surface(self, line: str, surfaces: dict) -> Surface:
+        """Returns the rendered surface of a line, rendering it only if it is not cached yet."""
+        surface = surfaces.get(line, None)
+        if surface == None:
+            surface = self._line_surfaces.get(line, None)
+            if surface == None:
+                surface = self.font.render(line, self.style["color"], size=self.font_size)[0]
+            surfaces[line] = surface
+        return surface
         
     def draw(self):
         Node.draw(self)
+        key = (self.font, self.font_size, tuple(self.style["color"]))
+        if key != self._line_surfaces_key:
+            self._line_surfaces = {}
+            self._line_surfaces_key = key
+        surfaces = {}
         for line in self._text_lines:
-            self.font.render_to(self.surface, (0, line[1]), line[0], self.style["color"], size=self.font_size)
+            self.surface.blit(self._line_surface(line[0], surfaces), (0, line[1]))
+        self._line_surfaces = surfaces
         
     def at_position(self, position: Tuple[int] or List[int]) -> Tuple[int] or None:
         """Returns the position (row, column) of the character in the text at the specified position (x, y) in local coordinates."""
-        row = 0
-        for line in self._text_lines:
-            if position[1] > line[1] and (row == len(self._text_lines) - 1 or position[1] < self._text_lines[row + 1][1]):
-                w = 0
-                txt = ""
-                for column in range(len(line[0])):
-                    txt += line[0][column]
-                    n_w = self.font.get_rect(txt, size=self.font_size).width
-                    if position[0] > w and position[0] < n_w:
-                        return (row, column)
-                    w = n_w
-            row += 1
-        return None
+        row = bisect_left(self._text_lines.positions, position[1]) - 1
+        if row < 0 or (row < len(self._text_lines) - 1 and position[1] >= self._text_lines[row + 1][1]):
+            return None
+        column = METRICS.column_at(self.font, self._text_lines[row][0], self.font_size, position[0])
+        if column == None:
+            return None
+        return (row, column)
     
     def char_at(self, position: Tuple[int] or List[int]) -> str:
         """Returns the character at the (row, column) position"""
@@ -497,6 +1235,8 @@ class SelectableText(Text):
     - Text parameters.
     """
     
+    __slots__ = ("selection_start", "selection_end", "_select_active")
+    
     def __init__(self, **data):
         Text.__init__(self, **data)
         self.clear_selection()
@@ -516,6 +1256,7 @@ class SelectableText(Text):
                 self.selection_end = loc
                 if isinstance(evt, DragEvent):
                     self._select_active = False
+            self.mark_dirty()
     
     def clear_selection(self, evt=None, *_):
         if evt != None:
@@ -527,6 +1268,7 @@ class SelectableText(Text):
         self.selection_start = [0, 0]
         self.selection_end = [0, 0]
         self._select_active = False
+        self.mark_dirty()
         
     def selected_lines(self) -> List[str]:
         """Get the lines of the selection."""
@@ -538,7 +1280,7 @@ class SelectableText(Text):
         start_col = self.selection_start[1] if self.selection_start[0] <= self.selection_end[0] else self.selection_end[1]
         end_col = self.selection_end[1] if self.selection_start[0] <= self.selection_end[0] else self.selection_start[1]
         row = start_row
-        for row_text in [l[0] for l in self._text_lines][start_row:end_row + 1]:
+        for row_text in self._text_lines.texts[start_row:end_row + 1]:
             if row == start_row:
                 if row == end_row:
                     lines.append(row_text[min(start_col, end_col):max(start_col, end_col) + 1])
@@ -568,19 +1310,24 @@ class SelectableText(Text):
             end_col = self.selection_end[1] if self.selection_start[0] <= self.selection_end[0] else self.selection_start[1]
             row = start_row
             for row_data in self._text_lines[start_row:end_row + 1]:
-                rect = [0, row_data[1] + self.font.get_rect(row_data[0], size=self.font_size).height - self.line_spacing - 1,
+                advances = METRICS.advances(self.font, row_data[0], self.font_size)
+                rect = [0, row_data[1] + METRICS.measure(self.font, row_data[0], self.font_size)[1] - self.line_spacing - 1,
                         0, self.line_spacing + 1]
                 if row == start_row:
                     if row == end_row:
-                        rect[0] = self.font.get_rect(row_data[0][:min(start_col, end_col)], size=self.font_size).width
-                        rect[2] = self.font.get_rect(row_data[0][min(start_col, end_col):max(start_col, end_col) + 1], size=self.font_size).width
+                        first = min(min(start_col, end_col), len(row_data[0]))
+                        last = min(max(start_col, end_col) + 1, len(row_data[0]))
                     else:
-                        rect[0] = self.font.get_rect(row_data[0][:start_col], size=self.font_size).width
-                        rect[2] = self.font.get_rect(row_data[0][start_col:], size=self.font_size).width
+                        first = min(start_col, len(row_data[0]))
+                        last = len(row_data[0])
                 elif row == end_row:
-                    rect[2] = self.font.get_rect(row_data[0][:end_col + 1], size=self.font_size).width
+                    first = 0
+                    last = min(end_col + 1, len(row_data[0]))
                 else:
-                    rect[2] = self.font.get_rect(row_data[0], size=self.font_size).width
+                    first = 0
+                    last = len(row_data[0])
+                rect[0] = advances[first]
+                rect[2] = advances[last] - advances[first]
                 draw_rect(self.surface, self.style["selection_color"], rect)
                 row += 1
                 
@@ -591,6 +1338,9 @@ class EditableText(SelectableText):
     Supported parameters:
     - SelectableText parameters.
     """
+    
+    __slots__ = ("_caret", "_blink")
+    
     #TODO: Work on this!
     
     def update(self, **data):
@@ -598,26 +1348,25 @@ class EditableText(SelectableText):
         SelectableText.update(self, **data)
         self.attach_receiver(ClickReceiver(self._on_click))
         self.attach_receiver(KeyboardReceiver(self, self._on_key))
+        self.attach_receiver(PropertyChangeReceiver("focused", self._on_focus))
+        self._caret = len(self._buffer)
         self._blink = 0
+        self.animated = self.focused
+        
+    def _on_focus(self, evt, *_):
+        self.animated = evt.value
         
     def _pos_to_index(self, pos):
-        i = 0
-        for l in range(pos[0]):
-            i += len(self._text_lines[l][0])
-        i += pos[1]
-        return i
+        return self._line_starts[pos[0]] + pos[1]
     
     def _index_to_pos(self, index):
-        pos = [0, 0]
-        i = 0
-        for line in [l[0] for l in self._text_lines]:
-            if i + len(line) + 1 < index:
-                pos[0] += 1
-                i += len(line) + 1
-            else:
-                pos[1] = index - i
-                break
-        return pos
+        row = bisect_right(self._line_starts, index) - 1
+        return [row, index - self._line_starts[row]]
+    
+    def _edit(self, start: int, end: int, text: str):
+        """Replace the characters between start and end, re-wrapping only the paragraphs affected."""
+        self._refit_text(*self._buffer.replace(start, end, text))
+        self._on_property_changed("text")
         
     def _on_click(self, evt, *_):
         if self.focused:
@@ -626,17 +1375,19 @@ class EditableText(SelectableText):
                 self._caret = self._pos_to_index(clicked)
         else:
             self.focused = True
-            self._caret = len(self.text)
+            self._caret = len(self._buffer)
+        self.mark_dirty()
             
     def _on_key(self, evt, *_):
-        if evt.type == CONFIGURATION["EVENT_TYPES"]["key_down"]:    
+        if evt.type == CONFIGURATION["EVENT_TYPES"]["key_down"]:
+            self.mark_dirty()
             if evt.key == 127:
-                if self._caret < len(self.text):
-                    self.text = self.text[:self._caret] + self.text[self._caret + 1:]
+                if self._caret < len(self._buffer):
+                    self._edit(self._caret, self._caret + 1, "")
                 return
             elif evt.key == 8:
                 if self._caret > 0:
-                    self.text = self.text[:self._caret - 1] + self.text[self._caret:]
+                    self._edit(self._caret - 1, self._caret, "")
                     self._caret -= 1
                 return
             elif evt.key == 276:
@@ -661,7 +1412,7 @@ class EditableText(SelectableText):
                     elif self.selection_end[0] < len(self._text_lines):
                         self.selection_end[0] += 1
                         self.selection_end[1] = 0
-                elif self._caret < len(self.text):
+                elif self._caret < len(self._buffer):
                     self._caret += 1
             elif evt.key == 27:
                 self.focused = False
@@ -697,20 +1448,24 @@ class EditableText(SelectableText):
                         c = ">"
                     elif evt.key == 47:
                         c = "?"
-                self.text = self.text[:self._caret] + c + self.text[self._caret:]
+                self._edit(self._caret, self._caret, c)
                 self._caret += 1
         
+    def tick(self):
+        self._blink -= 1
+        if self._blink == -10:
+            self._blink = 10
+        if self._blink == 10 or self._blink == -1:
+            self.mark_dirty()
+            
     def draw(self):
         SelectableText.draw(self)
-        if self.focused:
-            self._blink -= 1
-            if self._blink >= 0:
-                pos = self._index_to_pos(self._caret)
-                draw_rect(self.surface, self.style["color"],
-                           [self.font.get_rect(self._text_lines[pos[0]][0][:pos[1]], size=self.font_size).width,
-                            self._text_lines[pos[0]][1], 2, self.font_size])
-            if self._blink == -10:
-                self._blink = 10
+        if self.focused and self._blink >= 0:
+            pos = self._index_to_pos(self._caret)
+            line = self._text_lines[pos[0]][0]
+            draw_rect(self.surface, self.style["color"],
+                       [METRICS.advances(self.font, line, self.font_size)[min(pos[1], len(line))],
+                        self._text_lines[pos[0]][1], 2, self.font_size])
     
 class Button(Node):
     """
@@ -726,6 +1481,8 @@ class Button(Node):
     - animate_click: whether to invert colors when clicked. Default True.
     """
     
+    __slots__ = ("_restrict_width", "_restrict_height", "_margin", "animate_click", "_text")
+    
     def __init__(self, **data):
         Node.__init__(self, **data)
         self.attach_receiver(MouseReceiver(self._invert_on_click,
@@ -765,7 +1522,7 @@ class Button(Node):
                 "font": self.font,
                 "font_size": self.font_size
                 })
-        if len(self.children) > 0:
+        if len(self._children) > 0:
             self.clear()
         self.add(value)
         self._text = value
@@ -857,6 +1614,8 @@ class Image(Node):
     - maintain_ratio: whether to maintain the aspect ratio of the original image. Default True.
     """
     
+    __slots__ = ("_restrict_width", "_restrict_height", "_maintain_ratio", "_image")
+    
     def update(self, **data):
         Node.update(self, **data)
         self._restrict_width = data.get("restict_width", True)
@@ -872,11 +1631,11 @@ class Image(Node):
     def image(self, value):
         if type(value) == str:
             try:
-                self._image = load_image(value)
+                self._image = _convert_image(load_image(value))
             except:
                 print("Warning: The image", value, "could not be loaded!")
         elif isinstance(value, Surface):
-            self._image = value
+            self._image = _convert_image(value)
         else:
             self._image = Surface((self.width, self.height), SRCALPHA)
         self._process_image()
@@ -930,7 +1689,8 @@ class Image(Node):
                 h = self.height
         else:
             self.height = h
-        self._image = smoothscale(self._image, (w, h))
+        if (w, h) != self._image.get_size():
+            self._image = smoothscale(self._image, (w, h))
         
     def draw(self):
         Node.draw(self)
@@ -948,6 +1708,8 @@ class Checkbox(Node):
     - checked: whether the box is checked. Default False.
     """
     
+    __slots__ = ("spacing", "checked", "_text")
+    
     def __init__(self, **data):
         Node.__init__(self, **data)
         self.attach_receiver(ClickReceiver(self.flip))
@@ -1001,7 +1763,7 @@ class Checkbox(Node):
                 "font": self.font,
                 "font_size": self.font_size
                 })
-        if len(self.children) > 0:
+        if len(self._children) > 0:
             self.clear()
         self.add(value)
         self._text = value
@@ -1026,6 +1788,8 @@ class CircularCheckbox(Checkbox):
     - Checkbox parameters.
     """
     
+    __slots__ = ()
+    
     def draw(self):
         Node.draw(self)
         draw_circle(self.surface, self.style["color"], (int(self.font_size / 2), int(self.font_size / 2)), int(self.font_size / 2))
@@ -1042,6 +1806,8 @@ class ScrollBar(Node):
     - container: the ScrollableContainer the ScrollBar is an indicator for.
     """
     
+    __slots__ = ("container",)
+    
     def update(self, **data):
         Node.update(self, **data)
         self.container = data.get("container", None)
@@ -1079,16 +1845,24 @@ class ScrollBar(Node):
 class ScrollableContainer(Node):
     """
     A ScrollableContainer is used to hold other Nodes with the ability to scroll the contents.
+    Children keep their own x and y while scrolling; the offsets are applied when they are drawn and hit-tested.
     Supported parameters:
     - Node parameters.
     - scrollX: one of (None (default) - No horizontal scrolling, "show" - show scrollbar, "hide" - scroll only with gesture).
     - scrollY: one of (None - No vertical scrolling, "show" - show scrollbar (default), "hide" - scroll only with gesture).
     """
     
+    __slots__ = ("scrollX", "scrollY", "offsets", "_origin", "_hit_grid", "_content_grid", "_content_size", "_scrollBarX",
+                 "_scrollBarY")
+    
     def update(self, **data):
         self.scrollX = data.get("scrollX", None)
         self.scrollY = data.get("scrollY", "show")
         self.offsets = [0, 0]
+        self._origin = (0, 0)
+        self._hit_grid = HitGrid(CONFIGURATION["HIT_GRID_CELL_SIZE"])
+        self._content_grid = HitGrid(CONFIGURATION["HIT_GRID_CELL_SIZE"])
+        self._content_size = None
         
         self._scrollBarX = None
         self._scrollBarY = None
@@ -1102,8 +1876,6 @@ class ScrollableContainer(Node):
                 })
             
         Node.update(self, **data)
-        self.content_width = self.width
-        self.content_height = self.height
         
         drag_receiver = DragReceiver(None, self._gesture_scroll)
         drag_receiver.trigger_distance = 0
@@ -1117,6 +1889,7 @@ class ScrollableContainer(Node):
             
     def _generate(self, w, h):
         Node._generate(self, w, h)
+        self._content_size = None
         if self.scrollX == "show":
             self._scrollBarX.x = 0
             self._scrollBarX.y = self.height - 10
@@ -1128,20 +1901,113 @@ class ScrollableContainer(Node):
             self._scrollBarY.width = 10
             self._scrollBarY.height = self.height
             
+    def _is_scroll_bar(self, node: Node) -> bool:
+        return node == self._scrollBarX or node == self._scrollBarY
+    
+    @property
+    def content_width(self) -> int:
+        if self._content_size == None:
+            self._measure_content()
+        return self._content_size[0]
+    
+    @property
+    def content_height(self) -> int:
+        if self._content_size == None:
+            self._measure_content()
+        return self._content_size[1]
+    
+    def _measure_content(self):
+        """Find the size of the area covered by the children and the container."""
+        cw, ch = self.width, self.height
+        for child in self:
+            if not self._is_scroll_bar(child):
+                cw = max(cw, child.x + child.width)
+                ch = max(ch, child.y + child.height)
+        self._content_size = (cw, ch)
+    
+    def _track(self, child: Node):
+        """Update a child's box in the content index and grow the content size to fit it."""
+        old = self._content_grid.rect(child)
+        rect = Rect(child.x, child.y, child.width, child.height)
+        self._content_grid.update(child, rect)
+        if self._content_size != None:
+            if old != None and (old.right >= self._content_size[0] or old.bottom >= self._content_size[1]):
+                self._content_size = None
+            else:
+                self._content_size = (max(self._content_size[0], rect.right), max(self._content_size[1], rect.bottom))
+    
+    def _untrack(self, child: Node):
+        """Remove a child's box from the content index."""
+        old = self._content_grid.rect(child)
+        if old != None:
+            self._content_grid.remove(child)
+            if self._content_size != None and (old.right >= self._content_size[0] or old.bottom >= self._content_size[1]):
+                self._content_size = None
+    
     def add(self, *nodes: "Node"):
         Node.add(self, *nodes)
+        for node in nodes:
+            if not self._is_scroll_bar(node):
+                self._track(node)
+        self._update_scroll_bars()
+        
+    def insert(self, index: int, *nodes: "Node"):
+        Node.insert(self, index, *nodes)
+        for node in nodes:
+            if not self._is_scroll_bar(node):
+                self._track(node)
+        self._update_scroll_bars()
         
-        cw = self.width
-        for child in self.children:
-            if child.x + child.width > cw:
-                cw = child.x + child.width
-        self.content_width = cw
-        
-        ch = self.height
-        for child in self.children:
-            if child.y + child.height > ch:
-                ch = child.y + child.height
-        self.content_height = ch
+    def remove(self, *nodes: "Node"):
+        Node.remove(self, *nodes)
+        for node in nodes:
+            if node not in self:
+                self._untrack(node)
+        self._update_scroll_bars()
+    
+    def clear(self):
+        Node.clear(self)
+        self._content_grid = HitGrid(CONFIGURATION["HIT_GRID_CELL_SIZE"])
+        self._content_size = None
+    
+    def _on_child_bounds_changed(self, child: Node):
+        if child in self._content_grid:
+            self._track(child)
+            self._update_scroll_bars()
+    
+    def _child_position(self, child: Node) -> Tuple[int]:
+        if self._is_scroll_bar(child):
+            return (child._x, child._y)
+        return (child._x + self._origin[0], child._y + self._origin[1])
+    
+    def _scrolls(self, child: Node) -> bool:
+        return not self._is_scroll_bar(child)
+    
+    def _invalidate_position(self):
+        #The content is cached relative to this Node, so only the scroll bars move with it.
+        if self._cached_position == None:
+            return
+        self._cached_position = None
+        for bar in (self._scrollBarX, self._scrollBarY):
+            if bar != None and bar in self._children:
+                bar._invalidate_position()
+    
+    def visible_children(self, area: Rect = None) -> List[Node]:
+        """Returns the scroll bars and the children inside the visible part of the content, or of an area of it."""
+        if area == None:
+            area = Rect(0, 0, self.width, self.height)
+        found = self._content_grid.query_rect(area.move(-self._origin[0], -self._origin[1]))
+        for bar in (self._scrollBarX, self._scrollBarY):
+            if bar != None and bar in self._children:
+                found[bar] = None
+        return sorted(found, key=self._children.__getitem__)
+        
+    def _update_scroll_bars(self):
+        """Redraw the scroll bars to reflect the current offsets and content size."""
+        if self._scrollBarX != None:
+            self._scrollBarX.mark_dirty()
+        if self._scrollBarY != None:
+            self._scrollBarY.mark_dirty()
             
     def scroll(self, dx=0, dy=0):
         """Scroll the contents by the specified amount."""
@@ -1151,15 +2017,151 @@ class ScrollableContainer(Node):
             dy = 0
         self.offsets[0] += dx
         self.offsets[1] += dy
-        for child in self.children:
-            if child == self._scrollBarX or child == self._scrollBarY:
-                continue
-            if self.scrollX != None:
-                child.x += dx
-            if self.scrollY != None:
-                child.y += dy
+        origin = (self.offsets[0] if self.scrollX != None else 0, self.offsets[1] if self.scrollY != None else 0)
+        if origin != self._origin:
+            self._origin = origin
+            self.mark_dirty()
+            #The scroll bars stay in place, so their boxes move relative to the scrolled content.
+            for bar in (self._scrollBarX, self._scrollBarY):
+                if bar != None:
+                    bar._on_bounds_changed()
                 
-        if dy != 0 or dy != 0:
+        if dx != 0 or dy != 0:
+            self._update_scroll_bars()
+            self._on_property_changed("offsets")
+    
+    def _gesture_scroll(self, _, drag, __):
+        self.scroll(*drag)
+    
+    def _mouse_scroll(self, evt, *_):
+        if evt.button == 4:
+            self.scroll(0, 7)
+        else:
+            self.scroll(0, -7)
+
+class VirtualList(Node):
+    """
+    A VirtualList shows a long list of items in a fixed-height scrolling column.
+    Only the rows inside the visible area (plus a few above and below it) exist as Nodes; they are reused as the list scrolls,
+    so the cost of a VirtualList does not depend on the number of items.
+    Supported parameters:
+    - Node parameters.
+    - items: the data source, any sequence supporting len() and indexing. Default [].
+    - row_height: the height of each row in pixels. Default 20.
+    - overscan: the number of extra rows kept above and below the visible area. Default 2.
+    - create_row: a function returning a new row Node. Rows keep the x and y they were created with, relative to their slot.
+      Default: a Text Node.
+    - bind_row: a function (row, item, index) that shows an item in a row. Default: sets the row's text to str(item).
+    - scrollY: one of ("show" - show scrollbar (default), "hide" - scroll only with gesture).
+    """
+    
+    __slots__ = ("_items", "row_height", "overscan", "create_row", "bind_row", "scrollY", "offsets", "_rows", "_scrollBarY")
+    
+    def update(self, **data):
+        self._items = data.get("items", [])
+        self.row_height = data.get("row_height", 20)
+        self.overscan = data.get("overscan", 2)
+        self.create_row = data.get("create_row", self._create_text_row)
+        self.bind_row = data.get("bind_row", self._bind_text_row)
+        self.scrollY = data.get("scrollY", "show")
+        self.offsets = [0, 0]
+        self._rows = []
+        self._scrollBarY = None
+        if self.scrollY == "show":
+            self._scrollBarY = ScrollBar(**{
+                "container": self
+                })
+        
+        Node.update(self, **data)
+        
+        drag_receiver = DragReceiver(None, self._gesture_scroll)
+        drag_receiver.trigger_distance = 0
+        self.attach_receiver(drag_receiver)
+        self.attach_receiver(MouseScrollReveiver(self._mouse_scroll))
+        
+        if self.scrollY == "show":
+            self.add(self._scrollBarY)
+        self._layout_rows()
+    
+    def _generate(self, w, h):
+        Node._generate(self, w, h)
+        if self.scrollY == "show":
+            self._scrollBarY.x = w - 10
+            self._scrollBarY.y = 0
+            self._scrollBarY.width = 10
+            self._scrollBarY.height = h
+        if len(self._rows) > 0:
+            self._layout_rows()
+    
+    @property
+    def items(self):
+        return self._items
+    
+    @items.setter
+    def items(self, value):
+        self._items = value
+        for row in self._rows:
+            row[1] = None
+        self.scroll(0, 0)
+        self._layout_rows()
+        self._on_property_changed("items")
+    
+    @property
+    def content_width(self) -> int:
+        return self.width
+    
+    @property
+    def content_height(self) -> int:
+        return max(self.height, len(self._items) * self.row_height)
+    
+    def _create_text_row(self) -> Node:
+        return Text(**{
+            "width": self.width,
+            "restrict_width": True
+            })
+    
+    def _bind_text_row(self, row, item, index):
+        row.text = str(item)
+    
+    def _layout_rows(self):
+        """Bind the rows in and around the visible area to their items and move them into place."""
+        count = min(len(self._items), (self.height // self.row_height) + 2 + (2 * self.overscan))
+        while len(self._rows) < count:
+            row = self.create_row()
+            self._rows.append([row, None, row.y])
+            self.add(row)
+        while len(self._rows) > count:
+            self.remove(self._rows.pop()[0])
+        if count == 0:
+            return
+        
+        first = max(0, min((-self.offsets[1] // self.row_height) - self.overscan, len(self._items) - count))
+        for index in range(first, first + count):
+            row = self._rows[index % count]
+            if row[1] != index:
+                row[1] = index
+                self.bind_row(row[0], self._items[index], index)
+            row[0].y = self.offsets[1] + (index * self.row_height) + row[2]
+    
+    def row_at(self, index: int) -> Node or None:
+        """Returns the row Node currently showing the item at the index, or None if it is not within the visible area."""
+        for row in self._rows:
+            if row[1] == index:
+                return row[0]
+        return None
+    
+    def scroll_to(self, index: int):
+        """Scroll so the item at the index is at the top of the list, or as close as possible."""
+        self.scroll(0, -(index * self.row_height) - self.offsets[1])
+    
+    def scroll(self, dx=0, dy=0):
+        """Scroll the list vertically by the specified amount. dx is ignored."""
+        offset = max(-(self.content_height - self.height), min(0, self.offsets[1] + dy))
+        if offset != self.offsets[1]:
+            self.offsets[1] = offset
+            self._layout_rows()
+            if self._scrollBarY != None:
+                self._scrollBarY.mark_dirty()
             self._on_property_changed("offsets")
                 
     def _gesture_scroll(self, _, drag, __):
@@ -1182,6 +2184,8 @@ class DraggableContainer(Node):
     - size: The size of the bar. Default 20.
     """
     
+    __slots__ = ("target", "orientation", "bar")
+    
     def update(self, **data):
         Node.update(self, **data)
         self.clear()
@@ -1211,13 +2215,11 @@ class DraggableContainer(Node):
         
     def _update_size(self, *_):
         if self.orientation == "horizontal":
-            self.width = self.target.width
-            self.bar.width = self.width
-            self.height = self.target.height + self.bar.height
+            self.bar.width = self.target.width
+            self.size = (self.target.width, self.target.height + self.bar.height)
         else:
-            self.width = self.target.width + self.bar.width
-            self.bar.height = self.width
-            self.height = self.target.height
+            self.bar.height = self.target.height
+            self.size = (self.target.width + self.bar.width, self.target.height)
             
     def _handle_drag(self, evt, motion, *_):
         self.x += motion[0]
@@ -1235,6 +2237,8 @@ class Selector(Node):
     - font_size: the size of the text. Default 12.
     """
     
+    __slots__ = ("items", "value", "margin", "_text", "_bg")
+    
     def update(self, **data):
         Node.update(self, **data)
         self.items = [str(i) for i in data.get("items", [])]
@@ -1279,6 +2283,17 @@ class Selector(Node):
         self._on_property_changed("value")
         self._close_popup()
             
+    def _create_row(self) -> "Text":
+        return Text(**{
+            "font": self.font,
+            "font_size": self.font_size,
+            "x": self.margin[0],
+            "y": self.margin[1],
+            "width": self.width - (2 * self.margin[0]),
+            "restrict_width": True,
+            "receivers": [ClickReceiver(self._on_select)]
+            })
+    
     def _position_text(self):
         self._text.position = (self.margin[0], int((self.height / 2) - (self._text.height / 2)))
         
@@ -1287,31 +2302,24 @@ class Selector(Node):
             self.root_node().remove(self._bg)
         
     def _generate_popup(self, *_):
-        below = self.root_node().height - self.absolute_position[1] >= self.absolute_position[1] + self.height
+        abs_pos = self.absolute_position
+        below = self.root_node().height - abs_pos[1] >= abs_pos[1] + self.height
         ch = (self.font_size + (2 * self.margin[1])) * (len(self.items) if len(self.items) > 0 else 1)
-        ht = min(ch, self.root_node().height - self.absolute_position[1]) if below else min(ch, self.absolute_position[1] + self.height)
-        popup = ScrollableContainer(**{
-            "x": self.absolute_position[0],
-            "y": self.absolute_position[1] if below else (self.absolute_position[1] + self.height) - ht,
+        ht = min(ch, self.root_node().height - abs_pos[1]) if below else min(ch, abs_pos[1] + self.height)
+        popup = VirtualList(**{
+            "x": abs_pos[0],
+            "y": abs_pos[1] if below else (abs_pos[1] + self.height) - ht,
             "width": self.width,
             "height": ht,
+            "items": self.items,
+            "row_height": self.font_size + (2 * self.margin[1]),
+            "create_row": self._create_row,
             "style": {
                 "background_color": (255, 255, 255),
                 "border": 1,
                 "border_color": (50, 50, 50)
                 }
             })
-        for i in range(len(self.items)):
-            popup.add(Text(**{
-                "text": self.items[i],
-                "font": self.font,
-                "font_size": self.font_size,
-                "x": self.margin[0],
-                "y": (i * (self.font_size + (2 * self.margin[1]))) + self.margin[1],
-                "width": self.width - (2 * self.margin[0]),
-                "restrict_width": True,
-                "receivers": [ClickReceiver(self._on_select)]
-                }))
         self._bg = Node(**{
             "x": 0,
             "y": 0,
@@ -0,0 +1,147 @@
+from bisect import bisect_right
+from typing import Tuple, List
+
+"""
+This file contains the text storage used by Text Nodes.
+"""
+
+class Offsets(object):
+    __slots__ = ("_values", "_gap", "_shift")
+    
+    def __init__(self, values=()):
+        """
+        Offsets is a sequence of increasing numbers, such as the offsets at which paragraphs or lines start, that can be
+        shifted from an index on without visiting the values after it.
+        The values from the gap on are stored relative to a shared shift. Shifting from the gap only changes the shift;
+        moving the gap costs the distance it is moved, so repeated edits around the same place take constant time.
+        Offsets supports len, indexing and iteration, and can be searched with bisect.
+        """
+        self._values = list(values)
+        self._gap = len(self._values)
+        self._shift = 0
+    
+    def __len__(self):
+        return len(self._values)
+    
+    def __getitem__(self, index: int) -> int:
+        if index < 0:
+            index += len(self._values)
+        if index >= self._gap:
+            return self._values[index] + self._shift
+        return self._values[index]
+    
+    def __iter__(self):
+        for index in range(len(self._values)):
+            yield self[index]
+    
+    def _move_gap(self, index: int):
+        """Make the values before index absolute and the values from index on relative to the shift."""
+        values = self._values
+        if index > self._gap:
+            for i in range(self._gap, index):
+                values[i] += self._shift
+        elif index < self._gap:
+            for i in range(index, self._gap):
+                values[i] -= self._shift
+        self._gap = index
+        if index == len(values):
+            self._shift = 0
+    
+    def shift(self, index: int, delta: int):
+        """Add delta to the values from index on."""
+        if delta != 0:
+            self._move_gap(index)
+            self._shift += delta
+    
+    def replace(self, start: int, end: int, values: List[int]):
+        """Replace the values between start and end with new ones, as with a slice assignment. The values after them are kept."""
+        self._move_gap(end)
+        self._values[start:end] = values
+        self._gap = start + len(values)
+
+class Lines(object):
+    __slots__ = ("texts", "positions")
+    
+    def __init__(self, texts: List[str], positions: Offsets):
+        """
+        The laid out lines of a Text Node, as a sequence of (text, y) tuples.
+        The text of each line and its y position are kept apart, so the positions can be shifted after an edit without rebuilding the lines.
+        """
+        self.texts = texts
+        self.positions = positions
+    
+    def __len__(self):
+        return len(self.texts)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [(self.texts[i], self.positions[i]) for i in range(*index.indices(len(self.texts)))]
+        return (self.texts[index], self.positions[index])
+    
+    def __iter__(self):
+        return zip(self.texts, self.positions)
+
+class TextBuffer(object):
+    def __init__(self, text: str = ""):
+        """
+        A TextBuffer stores text as a list of paragraphs (the text between newlines) along with the offset at which each one starts.
+        Edits only rebuild the paragraphs they touch, and report which paragraphs were replaced so layouts can be updated in place.
+        The offsets of the following paragraphs are shifted lazily (see Offsets), and the whole text is only joined when it is read.
+        """
+        self.paragraphs = text.split("\n")
+        starts = []
+        offset = 0
+        for paragraph in self.paragraphs:
+            starts.append(offset)
+            offset += len(paragraph) + 1
+        self.starts = Offsets(starts)
+        self._length = len(text)
+        self._text = text
+    
+    @property
+    def text(self) -> str:
+        if self._text == None:
+            self._text = "\n".join(self.paragraphs)
+        return self._text
+    
+    def __len__(self):
+        return self._length
+    
+    def locate(self, index: int) -> Tuple[int]:
+        """Returns the (paragraph, column) position of the character at the index."""
+        index = max(0, min(index, self._length))
+        paragraph = bisect_right(self.starts, index) - 1
+        return (paragraph, index - self.starts[paragraph])
+    
+    def replace(self, start: int, end: int, text: str) -> Tuple[int]:
+        """
+        Replace the characters between start and end with text.
+        Returns the tuple (first, removed, inserted): the index of the first paragraph changed,
+        the number of paragraphs it replaced and the number of paragraphs now in their place.
+        """
+        start = max(0, min(start, self._length))
+        end = max(start, min(end, self._length))
+        first, first_col = self.locate(start)
+        last, last_col = self.locate(end)
+        new_paragraphs = (self.paragraphs[first][:first_col] + text + self.paragraphs[last][last_col:]).split("\n")
+        self.paragraphs[first:last + 1] = new_paragraphs
+        
+        new_starts = []
+        offset = self.starts[first]
+        for paragraph in new_paragraphs:
+            new_starts.append(offset)
+            offset += len(paragraph) + 1
+        delta = len(text) - (end - start)
+        self.starts.replace(first, last + 1, new_starts)
+        self.starts.shift(first + len(new_paragraphs), delta)
+        self._length += delta
+        self._text = None
+        return (first, last - first + 1, len(new_paragraphs))
+    
+    def insert(self, index: int, text: str) -> Tuple[int]:
+        """Insert text at the index. Returns the same tuple as replace."""
+        return self.replace(index, index, text)
+    
+    def delete(self, start: int, end: int) -> Tuple[int]:
+        """Remove the characters between start and end. Returns the same tuple as replace."""
+        return self.replace(start, end, "")
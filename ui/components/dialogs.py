@@ -23,6 +23,8 @@ class Dialog(Node):
     - button_text_color: The font color of the buttons. Default (255, 255, 255).
     """
     
+    __slots__ = ("cancelable", "_options", "_content", "button_height", "on_select", "_dialog_root", "_dialog")
+    
     def update(self, **data):
         Node.update(self, **data)
         self.cancelable = data.get("cancelable", True)
@@ -128,6 +130,8 @@ class TextDialog(Dialog):
     - text_color: The color of the text to display. Default (0, 0, 0).
     """ 
             
+    __slots__ = ("_text", "_text_width")
+    
     def update(self, **data):
         data["content"] = None
         Dialog.update(self, **data)
@@ -0,0 +1,78 @@
+from collections import OrderedDict
+from bisect import bisect_left
+from typing import Tuple, List
+from ui.config import CONFIGURATION
+
+"""
+This file contains the text measurement cache shared by Text Nodes.
+"""
+
+class MetricsCache(object):
+    def __init__(self, capacity: int):
+        """
+        A MetricsCache remembers text measurements keyed by (font, size, string).
+        The least recently used entries are discarded once more than capacity entries are stored.
+        """
+        self.capacity = capacity
+        self._sizes = OrderedDict()
+        self._advances = OrderedDict()
+    
+    def _lookup(self, table: OrderedDict, key):
+        value = table.get(key, None)
+        if value != None:
+            table.move_to_end(key)
+        return value
+    
+    def _store(self, table: OrderedDict, key, value):
+        table[key] = value
+        if len(table) > self.capacity:
+            table.popitem(last=False)
+        return value
+    
+    def measure(self, font, text: str, size: int) -> Tuple[int]:
+        """Returns the (width, height) of the bounding box of the rendered text."""
+        key = (font, size, text)
+        value = self._lookup(self._sizes, key)
+        if value == None:
+            rect = font.get_rect(text, size=size)
+            value = self._store(self._sizes, key, (rect.width, rect.height))
+        return value
+    
+    def width(self, font, text: str, size: int) -> int:
+        """Returns the width of the rendered text."""
+        return self.measure(font, text, size)[0]
+    
+    def advances(self, font, text: str, size: int) -> List[int]:
+        """
+        Returns the prefix advances of the text: the x offset at which each character starts,
+        followed by the total advance. The list has one more entry than the text has characters.
+        """
+        key = (font, size, text)
+        value = self._lookup(self._advances, key)
+        if value == None:
+            value = [0]
+            total = 0.0
+            metrics = font.get_metrics(text, size=size) if len(text) > 0 else []
+            for i in range(len(metrics)):
+                if metrics[i] != None:
+                    total += metrics[i][4]
+                else:
+                    total += self.width(font, text[i], size)
+                value.append(int(round(total)))
+            self._store(self._advances, key, value)
+        return value
+    
+    def column_at(self, font, text: str, size: int, x) -> int or None:
+        """Returns the index of the character spanning the x offset, or None if there is none."""
+        advances = self.advances(font, text, size)
+        i = bisect_left(advances, x)
+        if i == 0 or i >= len(advances) or x >= advances[i]:
+            return None
+        return i - 1
+    
+    def clear(self):
+        """Discard all cached measurements."""
+        self._sizes.clear()
+        self._advances.clear()
+
+METRICS = MetricsCache(CONFIGURATION["TEXT_METRICS_CACHE_SIZE"])
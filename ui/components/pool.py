@@ -0,0 +1,138 @@
+from pygame import Surface, SRCALPHA
+from pygame.display import get_surface as get_display_surface
+from collections import OrderedDict
+from weakref import WeakSet
+from typing import Tuple, List
+from ui.config import CONFIGURATION
+
+"""
+This file contains the pool that Node Surfaces are allocated from.
+"""
+
+def _create_surface(size: Tuple[int], alpha: bool) -> Surface:
+    """Returns a new Surface in the display's pixel format, with per-pixel alpha if alpha is True."""
+    if alpha:
+        return Surface(size, SRCALPHA)
+    display = get_display_surface()
+    return Surface(size, 0, display) if display != None else Surface(size)
+
+class SurfacePool(object):
+    def __init__(self, granularity: int, limit: int, headroom: float, slack: int):
+        """
+        A SurfacePool hands out Surfaces as subsurface views of larger backing Surfaces, whose sizes are rounded up
+        to a multiple of granularity. Released backings are kept, up to limit bytes, and reused for later requests
+        of the same rounded size and format; the least recently released are discarded first.
+        Surfaces that are resized get backings with headroom extra space, so they can keep growing without reallocating.
+        A resized Surface keeps its backing only while the backing is at most slack times the rounded area it needs.
+        Released backings only become available again after recycle() is called at the end of a frame,
+        so a backing is never handed out twice in the same frame.
+        """
+        self.granularity = granularity
+        self.limit = limit
+        self.headroom = headroom
+        self.slack = slack
+        self.allocations = 0
+        self.reuses = 0
+        self._owned = WeakSet()
+        self._released = OrderedDict()
+        self._released_bytes = 0
+        self._free = {}
+        self._order = OrderedDict()
+        self._bytes = 0
+    
+    def _round(self, n: int) -> int:
+        return max(1, -(-n // self.granularity)) * self.granularity
+    
+    @staticmethod
+    def _key(backing: Surface) -> Tuple:
+        return (backing.get_width(), backing.get_height(), (backing.get_flags() & SRCALPHA) != 0)
+    
+    @staticmethod
+    def _bytes_of(backing: Surface) -> int:
+        return backing.get_pitch() * backing.get_height()
+    
+    def _backing(self, surface: Surface) -> Surface or None:
+        """Returns the backing of a Surface handed out by the pool, or None if it did not come from the pool."""
+        backing = surface.get_parent()
+        return backing if backing != None and backing in self._owned else None
+    
+    def acquire(self, size: Tuple[int] or List[int], alpha: bool, headroom=False) -> Surface:
+        """Returns a cleared Surface of the given size, with per-pixel alpha if alpha is True."""
+        w, h = size
+        if w <= 0 or h <= 0:
+            return _create_surface((max(0, w), max(0, h)), alpha)
+        if headroom:
+            key = (self._round(int(w * (1 + self.headroom))), self._round(int(h * (1 + self.headroom))), alpha)
+        else:
+            key = (self._round(w), self._round(h), alpha)
+        backings = self._free.get(key, None)
+        if backings != None:
+            backing = backings.pop()
+            if len(backings) == 0:
+                del self._free[key]
+            del self._order[backing]
+            self._bytes -= self._bytes_of(backing)
+            self.reuses += 1
+            view = backing.subsurface((0, 0, w, h))
+            view.fill((0, 0, 0, 0))
+            return view
+        backing = _create_surface(key[:2], alpha)
+        self._owned.add(backing)
+        self.allocations += 1
+        return backing.subsurface((0, 0, w, h))
+    
+    def resize(self, surface: Surface, size: Tuple[int] or List[int]) -> Surface:
+        """
+        Returns a cleared Surface of the new size in the same format as surface, which must not be used afterwards.
+        If the new size fits in the backing of surface and does not waste most of it, the backing is reused;
+        otherwise surface is released.
+        """
+        w, h = size
+        backing = self._backing(surface)
+        if (backing != None and 0 < w <= backing.get_width() and 0 < h <= backing.get_height() and
+            backing.get_width() * backing.get_height() <= self.slack * self._round(w) * self._round(h)):
+            self.reuses += 1
+            view = backing.subsurface((0, 0, w, h))
+            view.fill((0, 0, 0, 0))
+            return view
+        self.release(surface)
+        return self.acquire(size, (surface.get_flags() & SRCALPHA) != 0, True)
+    
+    def release(self, surface: Surface):
+        """Return a Surface to the pool. It must not be used afterwards. Surfaces that did not come from the pool are ignored."""
+        backing = self._backing(surface)
+        if backing == None or backing in self._released or backing in self._order:
+            return
+        self._released[backing] = None
+        self._released_bytes += self._bytes_of(backing)
+        while self._released_bytes > self.limit:
+            self._released_bytes -= self._bytes_of(self._released.popitem(last=False)[0])
+    
+    def recycle(self):
+        """Make the Surfaces released since the last call available again. Called once per frame by the Display."""
+        for backing in self._released:
+            key = self._key(backing)
+            if key not in self._free:
+                self._free[key] = []
+            self._free[key].append(backing)
+            self._order[backing] = key
+            self._bytes += self._bytes_of(backing)
+        self._released.clear()
+        self._released_bytes = 0
+        while self._bytes > self.limit:
+            backing, key = self._order.popitem(last=False)
+            self._free[key].remove(backing)
+            if len(self._free[key]) == 0:
+                del self._free[key]
+            self._bytes -= self._bytes_of(backing)
+    
+    def clear(self):
+        """Discard all pooled Surfaces."""
+        self._released.clear()
+        self._released_bytes = 0
+        self._free.clear()
+        self._order.clear()
+        self._bytes = 0
+
+POOL = SurfacePool(CONFIGURATION["SURFACE_POOL_GRANULARITY"], CONFIGURATION["SURFACE_POOL_LIMIT"],
+                   CONFIGURATION["SURFACE_POOL_HEADROOM"], CONFIGURATION["SURFACE_POOL_SLACK"])
@@ -0,0 +1,79 @@
+from pygame import Rect
+from typing import Tuple, List
+
+"""
+This file contains the spatial index used to find Nodes under the mouse.
+"""
+
+class HitGrid(object):
+    def __init__(self, cell_size=64):
+        """
+        A HitGrid is a uniform grid of absolute bounding boxes used for hit-testing.
+        Each item is stored in every cell its box overlaps, so lookups only check the items in a single cell.
+        """
+        self.cell_size = cell_size
+        self._cells = {}
+        self._rects = {}
+    
+    def _cells_for(self, rect: Rect):
+        """Returns the cells covered by a Rect."""
+        cells = []
+        for cx in range(rect.left // self.cell_size, (rect.right // self.cell_size) + 1):
+            for cy in range(rect.top // self.cell_size, (rect.bottom // self.cell_size) + 1):
+                cells.append((cx, cy))
+        return cells
+    
+    def update(self, item, rect: Rect):
+        """Insert an item, or move it if it is already in the grid."""
+        if item in self._rects:
+            if self._rects[item] == rect:
+                return
+            self.remove(item)
+        self._rects[item] = Rect(rect)
+        for cell in self._cells_for(rect):
+            if cell not in self._cells:
+                self._cells[cell] = {}
+            self._cells[cell][item] = None
+    
+    def remove(self, item):
+        """Remove an item from the grid."""
+        if item not in self._rects:
+            return
+        rect = self._rects.pop(item)
+        for cell in self._cells_for(rect):
+            items = self._cells.get(cell, None)
+            if items != None:
+                items.pop(item, None)
+                if len(items) == 0:
+                    del self._cells[cell]
+    
+    def query(self, pos: Tuple[int] or List[int]) -> List:
+        """Returns the items whose boxes contain the position (edges inclusive)."""
+        items = self._cells.get((pos[0] // self.cell_size, pos[1] // self.cell_size), {})
+        found = []
+        for item in items:
+            rect = self._rects[item]
+            if rect.left <= pos[0] <= rect.right and rect.top <= pos[1] <= rect.bottom:
+                found.append(item)
+        return found
+    
+    def query_rect(self, rect: Rect) -> dict:
+        """Returns the items whose boxes overlap a Rect (edges inclusive), as the keys of a dict."""
+        found = {}
+        for cell in self._cells_for(rect):
+            for item in self._cells.get(cell, {}):
+                if item not in found:
+                    box = self._rects[item]
+                    if box.left <= rect.right and rect.left <= box.right and box.top <= rect.bottom and rect.top <= box.bottom:
+                        found[item] = None
+        return found
+    
+    def rect(self, item) -> Rect or None:
+        """Returns the box of an item, or None if it is not in the grid."""
+        return self._rects.get(item, None)
+    
+    def __contains__(self, item):
+        return item in self._rects
+    
+    def __len__(self):
+        return len(self._rects)
@@ -9,17 +9,44 @@ def invert_color(color, max_value=255):
     return tuple(color)
 
 class Style(object):
+    __slots__ = ("data", "defaults", "on_change")
+    
     def __init__(self, **data):
-        """Styling data for a Node."""
+        """
+        Styling data for a Node. The on_change method, if set, is called with the name of each modified attribute.
+        The defaults dict, if set, is shared between Styles and gives the values of attributes not set in data; it is never modified.
+        """
         self.data = data
+        self.defaults = None
+        self.on_change = None
+    
+    @staticmethod
+    def with_defaults(defaults: dict, **data) -> "Style":
+        """Returns a Style that falls back on a shared dict of defaults for the attributes it does not set."""
+        style = Style(**data)
+        style.defaults = defaults
+        return style
         
     def get(self, attribute: str, default=None):
         """Get the value of a styling attribute."""
-        return self.data.get(attribute, default)
+        if attribute in self.data or self.defaults == None:
+            return self.data.get(attribute, default)
+        return self.defaults.get(attribute, default)
     
     def set(self, attribute: str, value):
         """Set the value of a styling attribute."""
-        self.data[attribute] = value
+        if attribute not in self or self.get(attribute) != value:
+            self.data[attribute] = value
+            if self.on_change != None:
+                self.on_change(attribute)
+    
+    def reset(self):
+        """Return the attributes that have defaults to their default values."""
+        if self.defaults != None:
+            for attribute in [a for a in self.data if a in self.defaults]:
+                value = self.data.pop(attribute)
+                if value != self.defaults[attribute] and self.on_change != None:
+                    self.on_change(attribute)
         
     def __getitem__(self, attr):
         return self.get(attr)
@@ -28,10 +55,15 @@ class Style(object):
         self.set(attr, value)
         
     def __str__(self):
-        return "Stylesheet: " + str(self.data)
+        return "Stylesheet: " + str(dict((attribute, self[attribute]) for attribute in self))
+    
+    def __contains__(self, attribute):
+        return attribute in self.data or (self.defaults != None and attribute in self.defaults)
     
     def __iter__(self):
-        return iter(self.data.keys())
+        if self.defaults == None:
+            return iter(self.data.keys())
+        return iter(list(self.data) + [a for a in self.defaults if a not in self.data])
         
     @staticmethod
     def parse_style(value) -> "Style" or None:
@@ -44,15 +76,15 @@ class Style(object):
     
     @staticmethod
     def merge_styles(original: "Style", modifications: "Style") -> "Style":
-        """Merge the modified stylesheet onto the old one."""
-        for prop, value in modifications.data.items():
-            original[prop] = value
+        """Merge the modified stylesheet onto the old one. The shared defaults of the modifications are not copied."""
+        for prop in (modifications.data if modifications.defaults != None else modifications):
+            original[prop] = modifications[prop]
         return original
     
     @staticmethod
     def apply(style: "Style", node):
         """Apply the styling values to a Node."""
-        getval = lambda prop: style.data.get(prop, CONFIGURATION["STYLE_DEFAULTS"].get(prop, None))
+        getval = lambda prop: style.get(prop, CONFIGURATION["STYLE_DEFAULTS"].get(prop, None))
         for prop in style:
             value = getval(prop)
             if value != None:
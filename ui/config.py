@@ -9,6 +9,7 @@ POLARON_ROOT = __file__.replace("\\", "/")[:-9]
 
 DRAG = 1000
 PROPERTY_CHANGE = 1001
+APP_FRAME = 1002
 
 CONFIGURATION = {
     "DRAG_MIN_DISTANCE": 50,
@@ -42,12 +43,35 @@ CONFIGURATION = {
         "quit": QUIT,
         "video_resize": VIDEORESIZE,
         "drag": DRAG,
-        "property_change": PROPERTY_CHANGE
+        "property_change": PROPERTY_CHANGE,
+        "app_frame": APP_FRAME
         },
+    "UNPAINTED_PROPERTIES": [
+        "x",
+        "y",
+        "position",
+        "visible",
+        "children",
+        "name",
+        "focused_node"
+        ],
+    "DIRTY_RECT_LIMIT": 32,
+    "IDLE_WAIT_TIMEOUT": 1000,
+    "HIT_GRID_CELL_SIZE": 64,
+    "TEXT_METRICS_CACHE_SIZE": 8192,
+    "SURFACE_POOL_GRANULARITY": 32,
+    "SURFACE_POOL_LIMIT": 32 * 1024 * 1024,
+    "SURFACE_POOL_HEADROOM": 0.5,
+    "SURFACE_POOL_SLACK": 4,
+    "THREADED_TRANSPORT": "shared",
+    "THREADED_COMPRESSION": "zlib",
+    "THREADED_FRAME_CREDITS": 2,
+    "APP_HOST_WORKERS": 2,
     "PERMEABLE_EVENT_TYPES": [
         QUIT,
         VIDEORESIZE,
-        PROPERTY_CHANGE
+        PROPERTY_CHANGE,
+        APP_FRAME
         ],
     "KEY_MODIFIERS": {
         "left_shift": KMOD_LSHIFT,
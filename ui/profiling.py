@@ -0,0 +1,177 @@
+from time import perf_counter
+from pygame import Rect, K_F12
+from pygame.draw import rect as draw_rect
+from pygame.display import update as update_display
+
+from ui.components import Node
+from ui.actions import EventReceiver
+from ui.config import CONFIGURATION
+
+from typing import List
+
+"""
+This file contains the opt-in profiler that measures the cost of each Node.
+"""
+
+class NodeStats(object):
+    def __init__(self, node):
+        """The time spent on and work done by a single Node while profiling."""
+        self.node = node
+        self.draw_time = 0.0
+        self.draws = 0
+        self.blit_time = 0.0
+        self.event_time = 0.0
+        self.events = 0
+        self.receivers = {}
+        self.property_changes = {}
+        self.notified = 0
+    
+    @property
+    def total_time(self) -> float:
+        return self.draw_time + self.blit_time + self.event_time
+    
+    def as_dict(self, frames: int) -> dict:
+        return {
+            "node": str(self.node),
+            "draw_ms": self.draw_time * 1000,
+            "draws": self.draws,
+            "blit_ms": self.blit_time * 1000,
+            "event_ms": self.event_time * 1000,
+            "events": self.events,
+            "receivers": dict((label, {"ms": value[0] * 1000, "calls": value[1]}) for label, value in self.receivers.items()),
+            "property_changes": dict(self.property_changes),
+            "notified": self.notified,
+            "ms_per_frame": self.total_time * 1000 / max(1, frames)
+            }
+
+class Profiler(object):
+    _active = None
+    
+    def __init__(self, application, overlay=False, toggle_key=K_F12, highlight=5):
+        """
+        A Profiler records, for each Node, the time spent in draw() and blitting its children, the time spent in each of its
+        EventReceivers, and how many property changes it made and how many receivers they were delivered to.
+        Nothing is measured until enable() is called: it installs the Profiler as Node._profiler, which Nodes call around
+        draw(), each child blit and each receiver, and disable() removes it again.
+        If overlay is True, the most expensive Nodes are outlined on screen. toggle_key turns the overlay on and off.
+        """
+        self.application = application
+        self.overlay = overlay
+        self.toggle_key = toggle_key
+        self.highlight = highlight
+        self.enabled = False
+        self._originals = {}
+        self._toggle_receiver = EventReceiver(CONFIGURATION["EVENT_TYPES"]["key_down"], self._toggle)
+        self.reset()
+    
+    def reset(self):
+        """Discard everything recorded so far."""
+        self.stats = {}
+        self.frames = 0
+    
+    def _stats_for(self, node) -> NodeStats:
+        stats = self.stats.get(node, None)
+        if stats == None:
+            stats = NodeStats(node)
+            self.stats[node] = stats
+        return stats
+    
+    def enable(self):
+        """Start recording."""
+        if self.enabled:
+            return
+        if Profiler._active != None:
+            raise RuntimeError("Another Profiler is already enabled.")
+        Profiler._active = self
+        self.enabled = True
+        profiler = self
+        self._originals = {
+            "_on_property_changed": Node._on_property_changed
+            }
+        original_property_changed = Node._on_property_changed
+        display = self.application.display
+        original_present = display.present
+        
+        def _on_property_changed(node, prop: str):
+            """Node._on_property_changed, counting changes."""
+            stats = profiler._stats_for(node)
+            stats.property_changes[prop] = stats.property_changes.get(prop, 0) + 1
+            original_property_changed(node, prop)
+        
+        def present():
+            """Display.present, counting frames and drawing the overlay."""
+            profiler.frames += 1
+            original_present()
+            if profiler.overlay:
+                profiler._draw_overlay(display)
+        
+        Node._profiler = self
+        Node._on_property_changed = _on_property_changed
+        display.present = present
+        display.root.attach_receiver(self._toggle_receiver)
+    
+    def disable(self):
+        """Stop recording and restore the original Node methods."""
+        if not self.enabled:
+            return
+        Node._profiler = None
+        for name, method in self._originals.items():
+            setattr(Node, name, method)
+        del self.application.display.present
+        self.application.display.root.detach_receiver(self._toggle_receiver)
+        self.enabled = False
+        Profiler._active = None
+    
+    def timed(self, node, kind, method, *args):
+        """
+        Called by Nodes while the Profiler is enabled: calls method with args and adds the time it took to the figures of node.
+        kind is "draw", "blit" or the EventReceiver that method belongs to.
+        """
+        stats = self._stats_for(node)
+        start = perf_counter()
+        try:
+            return method(*args)
+        finally:
+            elapsed = perf_counter() - start
+            if kind == "draw":
+                stats.draw_time += elapsed
+                stats.draws += 1
+            elif kind == "blit":
+                stats.blit_time += elapsed
+            else:
+                label = type(kind).__name__ + ":" + getattr(kind.on_receipt, "__qualname__", str(kind.on_receipt))
+                entry = stats.receivers.setdefault(label, [0.0, 0])
+                entry[0] += elapsed
+                entry[1] += 1
+                stats.event_time += elapsed
+                stats.events += 1
+                if args[0].type == CONFIGURATION["EVENT_TYPES"]["property_change"]:
+                    stats.notified += 1
+    
+    def _toggle(self, evt, *_):
+        if self.toggle_key != None and evt.key == self.toggle_key:
+            self.overlay = not self.overlay
+            self.application.display.root.mark_dirty()
+    
+    def report(self, top=10) -> List[dict]:
+        """Returns the recorded figures for the top most expensive Nodes, most expensive first."""
+        ranked = sorted(self.stats.values(), key=lambda stats: stats.total_time, reverse=True)
+        return [stats.as_dict(self.frames) for stats in ranked[:top]]
+    
+    def _draw_overlay(self, display):
+        """Outline the most expensive Nodes on the display, labelled with their time per frame."""
+        display.surface.blit(display.root.surface, (0, 0))
+        ranked = sorted(self.stats.values(), key=lambda stats: stats.draw_time + stats.blit_time, reverse=True)
+        font = CONFIGURATION["DEFAULT_FONTS"]["regular"]
+        for stats in ranked[:self.highlight]:
+            node = stats.node
+            if node.root_node() != display.root:
+                continue
+            position = node.absolute_position
+            draw_rect(display.surface, (255, 0, 0), Rect(position[0], position[1], node.width, node.height), 2)
+            label = type(node).__name__ + " " + str(round((stats.draw_time + stats.blit_time) * 1000 / max(1, self.frames), 2)) + " ms"
+            label_rect = font.get_rect(label, size=12)
+            draw_rect(display.surface, (255, 0, 0), Rect(position[0], position[1], label_rect.width + 4, label_rect.height + 4))
+            font.render_to(display.surface, (position[0] + 2, position[1] + 2), label, (255, 255, 255), size=12)
+        if not display.threaded and not display.headless:
+            update_display()
@@ -1,17 +1,20 @@
 from subprocess import Popen as new_process
 from subprocess import PIPE
-from threading import Thread
+from threading import Thread, Lock
 from queue import Queue, Empty
 from sys import builtin_module_names, stdin
 
 from sys import executable as PYTHON_EXEC
 from os import environ as OS_ENV_VARS
+from json import dumps as to_json
 from pygame.image import frombuffer
 from pygame.event import Event as PygameEvent
-from base64 import b64decode, b64encode
-from ast import literal_eval
+from pygame.event import post as post_event
+from pygame import error as pygame_error
+from base64 import b64decode
 
 from ui.config import POLARON_ROOT, CONFIGURATION
+from ui.threaded.transport import FrameBuffer, apply_delta, encode_event, read_event
 from ui.components import Node
 from ui.actions import EventMonitor, MouseReceiver, EventReceiver,\
     KeyboardReceiver
@@ -20,94 +23,288 @@ def is_threaded() -> bool:
     """Returns True if the current process is a subthread."""
     return OS_ENV_VARS.get("POLARON_SUBTHREAD", False) == "YES"
 
-def _enqueue(stream, queue):
-    for line in iter(stream.readline, b''):
-        queue.put(line)
+def threaded_transport() -> str:
+    """Returns the frame transport requested by the parent process: "shared" or "stdout"."""
+    return OS_ENV_VARS.get("POLARON_TRANSPORT", "stdout")
+
+def frame_encoding() -> str or None:
+    """Returns the encoding of delta frames sent on stdout ("raw" or "zlib"), or None if the parent process only accepts full frames."""
+    return OS_ENV_VARS.get("POLARON_FRAME_ENCODING", None)
+
+def frame_credits() -> int or None:
+    """Returns the number of frames the process may send before the parent process shows one, or None if there is no limit."""
+    credits = OS_ENV_VARS.get("POLARON_FRAME_CREDITS", None)
+    return int(credits) if credits != None else None
+
+class FrameMailbox(object):
+    def __init__(self):
+        """
+        A FrameMailbox holds the newest frame received from a process.
+        Frames are decoded as they arrive; a frame that is replaced before it is taken is counted as dropped.
+        """
+        self._lock = Lock()
+        self._frame = None
+        self._path = None
+        self._untaken = 0
+        self.received = 0
+        self.taken = 0
+        self.dropped = 0
+        
+    def put(self, line: str) -> bool:
+        """Decode a line sent by the process. Returns True if it was a frame and no other frame was waiting to be taken."""
+        try:
+            with self._lock:
+                if line.startswith("<@") and line[-1] == ">":
+                    self._path = line[2:line.rfind("|")]
+                elif line.startswith("<+") and line[-1] == ">":
+                    self._frame = apply_delta(self._frame, line)
+                elif len(line) > 0 and line[0] == "<" and line[-1] == ">":
+                    w = int(line[1:line.find(",")])
+                    h = int(line[line.find(",") + 1:line.find("|")])
+                    self._frame = frombuffer(b64decode(line[line.find("|") + 1:-1]), (w, h), "RGBX")
+                else:
+                    return False
+                self.received += 1
+                if self._untaken > 0:
+                    self.dropped += 1
+                self._untaken += 1
+                return self._untaken == 1
+        except Exception as e:
+            print("Malformed frame received!")
+            print(e)
+            return False
+        
+    def take(self) -> tuple:
+        """
+        Returns the tuple (frame, count) of the newest frame and the number of frames received since the last call,
+        including the ones it replaced. The frame is None if no frame arrived since the last call.
+        The frame is a copy of the decoded Surface, or the path of the FrameBuffer for the shared transport.
+        """
+        with self._lock:
+            count = self._untaken
+            if count == 0:
+                return (None, 0)
+            self._untaken = 0
+            self.taken += 1
+            return (self._path if self._path != None else self._frame.copy(), count)
+
+def _enqueue(stream, mailbox):
+    """Read lines from the stream into the mailbox, posting an app_frame event when a new frame is waiting."""
+    for line in iter(stream.readline, ''):
+        if mailbox.put(line.rstrip("\n")):
+            try:
+                post_event(PygameEvent(CONFIGURATION["EVENT_TYPES"]["app_frame"]))
+            except pygame_error:
+                pass
     stream.close()
 
-def start_app(path, local=POLARON_ROOT[:-3], *args):
-    """Runs the specified file as a Polaron app in a subprocess. Specify the local (working) directory and arguments to pass."""
+def _enqueue_events(stream, queue):
+    """Read binary-encoded events from the stream into the queue."""
+    while True:
+        evt = read_event(stream)
+        if evt == None:
+            break
+        queue.put(evt)
+
+def _app_environment(transport: str, compression: str or None) -> dict:
+    """Returns the environment variables that tell a subprocess how to talk to its parent."""
+    return {
+        "POLARON_SUBTHREAD": "YES",
+        "POLARON_ROOT": POLARON_ROOT,
+        "POLARON_TRANSPORT": transport,
+        "POLARON_FRAME_ENCODING": "zlib" if compression == "zlib" else "raw",
+        "POLARON_FRAME_CREDITS": str(CONFIGURATION["THREADED_FRAME_CREDITS"])
+        }
+
+def _new_process(command, env, local):
     e = OS_ENV_VARS.copy()
-    e["POLARON_SUBTHREAD"] = "YES"
-    e["POLARON_ROOT"] = POLARON_ROOT
-    proc = new_process([PYTHON_EXEC, path, *args], env=e, cwd=local, stdout=PIPE, stdin=PIPE, bufsize=1, universal_newlines=True,
+    e.update(env)
+    return new_process(command, env=e, cwd=local, stdout=PIPE, stdin=PIPE, bufsize=1, universal_newlines=True,
                        close_fds=("posix" in builtin_module_names))
-    queue = Queue()
-    Thread(target=_enqueue, args=(proc.stdout, queue), daemon=True, name="Polaron: App").start()
-    return proc, queue
+
+def _receive_frames(proc) -> FrameMailbox:
+    """Start reading frames from the process. Returns the FrameMailbox they are delivered to."""
+    mailbox = FrameMailbox()
+    Thread(target=_enqueue, args=(proc.stdout, mailbox), daemon=True, name="Polaron: App").start()
+    return mailbox
+
+def start_app(path, local=POLARON_ROOT[:-3], *args, transport=None, compression=None):
+    """
+    Runs the specified file as a Polaron app in a subprocess. Specify the local (working) directory and arguments to pass.
+    transport selects how frames are sent back: "shared" uses a memory-mapped FrameBuffer, "stdout" encodes the changed areas on stdout.
+    compression may be "zlib" to compress the areas sent on stdout, or "raw" to send them uncompressed.
+    Both default to the values in CONFIGURATION at the time of the call.
+    """
+    if transport == None:
+        transport = CONFIGURATION["THREADED_TRANSPORT"]
+    if compression == None:
+        compression = CONFIGURATION["THREADED_COMPRESSION"]
+    proc = _new_process([PYTHON_EXEC, path, *args], _app_environment(transport, compression), local)
+    return proc, _receive_frames(proc)
+
+class AppHost(object):
+    def __init__(self, workers=None, transport=None, compression=None):
+        """
+        An AppHost keeps a pool of worker processes that have already imported Polaron and loaded its fonts.
+        start_app hands an app to an idle worker instead of starting a new interpreter, and a new worker is started to take its place.
+        Workers are not reused once their app exits.
+        The arguments default to the values in CONFIGURATION at the time the AppHost is created.
+        """
+        self.workers = workers if workers != None else CONFIGURATION["APP_HOST_WORKERS"]
+        self.transport = transport if transport != None else CONFIGURATION["THREADED_TRANSPORT"]
+        self.compression = compression if compression != None else CONFIGURATION["THREADED_COMPRESSION"]
+        self._idle = []
+        self._fill()
+        
+    def _fill(self):
+        """Start workers until the pool is full again."""
+        self._idle = [proc for proc in self._idle if proc.poll() == None]
+        while len(self._idle) < self.workers:
+            self._idle.append(_new_process([PYTHON_EXEC, "-m", "ui.threaded.worker"], _app_environment(self.transport, self.compression),
+                                           POLARON_ROOT[:-3]))
+        
+    def start_app(self, path, local=POLARON_ROOT[:-3], *args):
+        """Runs the specified file as a Polaron app in a worker process. Returns the same values as start_app."""
+        self._idle = [proc for proc in self._idle if proc.poll() == None]
+        if len(self._idle) == 0:
+            self._fill()
+        proc = self._idle.pop(0)
+        proc.stdin.buffer.write(bytes(to_json({"path": path, "local": local, "args": list(args)}) + "\n", encoding="utf-8"))
+        proc.stdin.buffer.flush()
+        self._fill()
+        return proc, _receive_frames(proc)
+    
+    def close(self):
+        """Stop the idle workers. Apps that are running are not affected."""
+        for proc in self._idle:
+            proc.kill()
+            proc.wait()
+        self._idle = []
 
 class ThreadedEventMonitor(EventMonitor):
-    """Monitors for events from stdin."""
+    """Monitors for binary-encoded events from stdin."""
     def __init__(self, display):
         EventMonitor.__init__(self, display)
         self.queue = Queue()
-        Thread(target=_enqueue, args=(stdin, self.queue), daemon=True, name="Polaron: EventMonitor").start()
+        Thread(target=_enqueue_events, args=(stdin.buffer, self.queue), daemon=True, name="Polaron: EventMonitor").start()
+        
+    def wait(self, timeout: int):
+        try:
+            self._pending.append(self.queue.get(timeout=timeout / 1000))
+        except Empty:
+            pass
     
     def _monitor(self):
+        """Dispatch every event received since the last check."""
+        evts = self._pending
+        self._pending = []
         try:
-            line = self.queue.get_nowait().rstrip("\n")
-            if len(line) > 0 and line[0] == "<" and line[-1] == ">":
-                evt = PygameEvent(int(line[1:line.find("|")]), literal_eval(str(b64decode(line[line.find("|") + 1:-1]), encoding="utf-8")))
-                self.dispatch(evt)
-                if evt.type == CONFIGURATION["EVENT_TYPES"]["quit"]:
-                    return False
+            while True:
+                evts.append(self.queue.get_nowait())
         except Empty:
             pass
+        for evt in evts:
+            if evt.type == CONFIGURATION["EVENT_TYPES"]["app_frame"]:
+                self._display.add_frame_credits(evt.__dict__.get("credits", 0))
+                continue
+            self.dispatch(evt)
+            if evt.type == CONFIGURATION["EVENT_TYPES"]["quit"]:
+                return False
         return True
     
     @staticmethod
-    def encode_event(evt):
-        """Encode a Pygame event as a base64 string that can be sent over a pipe."""
-        return str(evt.type) + "|" + b64encode(bytes(str(evt.__dict__), encoding="utf-8")).decode("ascii")
+    def encode_event(evt) -> bytes:
+        """Encode a Pygame event as a binary record that can be sent over a pipe."""
+        return encode_event(evt)
 
 class ThreadedDisplay(Node):
     """
     A ThreadedDisplay node is used to display the UI of a Subprocess and display it as a Node.
     The Node is automatically resized to match the Display size communicated by the process.
-    The queue argument is the Queue object returned by start_app.
+    The mailbox argument is the FrameMailbox object returned by start_app.
     Supported parameters:
     - Node parameters
     """
     
-    def __init__(self, proc, queue, **data):
+    __slots__ = ("process", "mailbox", "_frame", "_frames")
+    
+    def __init__(self, proc, mailbox, **data):
         Node.__init__(self, **data)
         self.process = proc
-        self.queue = queue
+        self.mailbox = mailbox
         self._frame = None
+        self._frames = None
         self.attach_receiver(MouseReceiver(self._mouse_passthrough))
         self.attach_receiver(EventReceiver(CONFIGURATION["EVENT_TYPES"]["quit"], self.passthrough))
         self.attach_receiver(KeyboardReceiver(self, self.passthrough))
+        self.attach_receiver(EventReceiver(CONFIGURATION["EVENT_TYPES"]["app_frame"], self._receive_frame))
         
     def _mouse_passthrough(self, evt, *_):
-        evt.pos = (evt.pos[0] - self.absolute_position[0], evt.pos[1] - self.absolute_position[1])
+        abs_pos = self.absolute_position
+        evt.pos = (evt.pos[0] - abs_pos[0], evt.pos[1] - abs_pos[1])
         self.passthrough(evt)
         
     def passthrough(self, evt, *_):
         try:
-            self.process.stdin.write("<" + ThreadedEventMonitor.encode_event(evt) + ">\n")
+            self.process.stdin.buffer.write(encode_event(evt))
+            self.process.stdin.buffer.flush()
         except:
             self._frame.fill((255, 150, 150))
         
-    def draw(self):
-        Node.draw(self)
+    def _receive_frame(self, *_):
+        """Display the newest frame sent by the process, if there is one, and let the process render as many frames as it sent."""
+        frame, count = self.mailbox.take()
+        if frame == None:
+            return
         try:
-            line = self.queue.get_nowait().rstrip("\n")
-            if len(line) > 0 and line[0] == "<" and line[-1] == ">":
-                try:
-                    w = int(line[1:line.find(",")])
-                    h = int(line[line.find(",") + 1:line.find("|")])
-                    self._frame = frombuffer(b64decode(line[line.find("|") + 1:-1]), (w, h), "RGBA")
-                    if self.width != w:
-                        self.width = w
-                    if self.height != h:
-                        self.height = h
-                    self.root_node().redraw = True
-                except Exception as e:
-                    print("Malformed frame received!")
-                    print(e)
-        except Empty:
+            self.process.stdin.buffer.write(encode_event(PygameEvent(CONFIGURATION["EVENT_TYPES"]["app_frame"], credits=count)))
+            self.process.stdin.buffer.flush()
+        except:
             pass
-        if self._frame != None:
-            self.surface.blit(self._frame, (0, 0))
+        if isinstance(frame, str):
+            self._receive_shared_frame(frame)
+        else:
+            self._frame = frame
+            if self.width != frame.get_width():
+                self.width = frame.get_width()
+            if self.height != frame.get_height():
+                self.height = frame.get_height()
+            self.mark_dirty()
             
-            
\ No newline at end of file
+    @property
+    def frame_stats(self) -> dict:
+        """The number of frames received from the process, shown and dropped without being shown."""
+        return {
+            "received": self.mailbox.received,
+            "shown": self.mailbox.taken,
+            "dropped": self.mailbox.dropped
+            }
+        
+    def _receive_shared_frame(self, path):
+        """Display the last frame in the FrameBuffer at path, opening it if the process has switched buffers."""
+        if self._frames == None or self._frames.path != path:
+            try:
+                frames = FrameBuffer(path=path)
+            except (OSError, ValueError):
+                return
+            if self._frames != None:
+                self._frame = None
+                self._frames.close()
+            self._frames = frames
+        if self.width != self._frames.width:
+            self.width = self._frames.width
+        if self.height != self._frames.height:
+            self.height = self._frames.height
+        self._frame = self._frames.read()[1]
+        self.mark_dirty()
+        
+    def draw(self):
+        Node.draw(self)
+        if self._frames != None:
+            for _ in range(3):
+                seq, self._frame = self._frames.read()
+                self.surface.blit(self._frame, (0, 0))
+                if not self._frames.torn(seq):
+                    break
+        elif self._frame != None:
+            self.surface.blit(self._frame, (0, 0))
\ No newline at end of file
@@ -0,0 +1,226 @@
+from mmap import mmap
+from struct import Struct, error as struct_error
+from tempfile import mkstemp
+from weakref import finalize
+from atexit import register as at_exit
+from os import ftruncate, close as close_fd, remove as remove_file
+from zlib import compress, decompress
+from base64 import b64encode, b64decode
+from pygame import Surface, Rect
+from pygame.event import Event as PygameEvent
+from pygame.image import frombuffer, tostring as surface_to_str
+
+from typing import List
+
+"""
+This file contains the frame and event encodings used between Polaron apps and ThreadedDisplays.
+"""
+
+HEADER = Struct("<4sIIQQ")
+MAGIC = b"PLRF"
+
+EVENT_HEADER = Struct("<HII")
+EVENT_FIELDS = [("pos", "2i"), ("rel", "2i"), ("buttons", "B*"), ("button", "i"), ("key", "i"), ("mod", "I"), ("modifiers", "I"),
+                ("scancode", "i"), ("unicode", "s"), ("text", "s"), ("x", "i"), ("y", "i"), ("flipped", "?"), ("touch", "?"),
+                ("size", "2i"), ("w", "i"), ("h", "i"), ("gain", "i"), ("state", "i"), ("credits", "i")]
+
+#Files that could not be removed yet, because another process still had them mapped (which Windows does not allow).
+_PENDING_REMOVALS = {}
+
+def _remove(path: str):
+    try:
+        remove_file(path)
+    except FileNotFoundError:
+        pass
+    except OSError:
+        _PENDING_REMOVALS[path] = None
+
+@at_exit
+def _remove_pending():
+    """Retry removing the files that were still mapped when their FrameBuffers were closed."""
+    for path in list(_PENDING_REMOVALS):
+        _PENDING_REMOVALS.pop(path)
+        try:
+            remove_file(path)
+        except OSError:
+            pass
+
+def _release(buffer: mmap, slots: list, path: str or None):
+    """Unmap a FrameBuffer, then remove its file if a path is given. The frames are dropped first so the map can be closed."""
+    del slots[:]
+    try:
+        buffer.close()
+    except BufferError:
+        #A frame returned by read is still referenced; the map is closed when the last one is collected.
+        pass
+    if path != None:
+        _remove(path)
+
+class FrameBuffer(object):
+    def __init__(self, width: int = 0, height: int = 0, path: str = None):
+        """
+        A FrameBuffer is a memory-mapped file holding two frames of RGBX pixels after a small header.
+        Without a path, a new file is created for writing frames of the given size; it is removed when the FrameBuffer is closed or collected.
+        With a path, an existing file is opened for reading and removed as soon as it is mapped, so it does not outlive the two
+        processes even if they are killed. A buffer can therefore only be opened by one reader.
+        The header holds the size, the number of the last complete frame and the number of the frame being written.
+        Frame n is written into slot n % 2, so readers can use the last complete frame while the next one is written.
+        """
+        if path == None:
+            fd, path = mkstemp(prefix="polaron-", suffix=".frames")
+            try:
+                ftruncate(fd, HEADER.size + 2 * width * height * 4)
+                self._map = mmap(fd, HEADER.size + 2 * width * height * 4)
+            finally:
+                close_fd(fd)
+            HEADER.pack_into(self._map, 0, MAGIC, width, height, 0, 0)
+            owned = path
+        else:
+            with open(path, "r+b") as f:
+                self._map = mmap(f.fileno(), 0)
+            magic, width, height = HEADER.unpack_from(self._map, 0)[:3]
+            if magic != MAGIC:
+                self._map.close()
+                raise ValueError("Not a Polaron frame buffer.")
+            #Both processes have the file mapped now; the pixels stay shared after it is removed.
+            _remove(path)
+            owned = None
+        self.path = path
+        self.width = width
+        self.height = height
+        self._slots = [frombuffer(memoryview(self._map)[HEADER.size + i * width * height * 4:HEADER.size + (i + 1) * width * height * 4],
+                                  (width, height), "RGBX") for i in range(2)]
+        self._finalizer = finalize(self, _release, self._map, self._slots, owned)
+        self._last_rects = [Rect(0, 0, width, height)]
+    
+    @property
+    def seq(self) -> int:
+        """The number of the last complete frame."""
+        return HEADER.unpack_from(self._map, 0)[3]
+    
+    @property
+    def writing(self) -> int:
+        """The number of the frame being written, or of the last complete frame if none is being written."""
+        return HEADER.unpack_from(self._map, 0)[4]
+    
+    def _set_counters(self, seq: int, writing: int):
+        HEADER.pack_into(self._map, 0, MAGIC, self.width, self.height, seq, writing)
+    
+    def write(self, surface: Surface, rects: List[Rect]) -> int:
+        """
+        Copy the changed areas of a surface into the next frame and publish it. Returns the new frame number.
+        The areas that changed in the previous frame are copied too, since the slot being written last held the frame before that.
+        """
+        seq = self.seq
+        self._set_counters(seq, seq + 1)
+        slot = self._slots[(seq + 1) % 2]
+        for rect in self._last_rects + rects:
+            slot.blit(surface, rect, rect)
+        self._last_rects = rects
+        self._set_counters(seq + 1, seq + 1)
+        return seq + 1
+    
+    def read(self) -> tuple:
+        """Returns the tuple (seq, surface) of the last complete frame. The surface shares memory with the buffer."""
+        seq = self.seq
+        return (seq, self._slots[seq % 2])
+    
+    def torn(self, seq: int) -> bool:
+        """Returns True if the frame seq may have been overwritten since it was read."""
+        return self.writing >= seq + 2
+    
+    def close(self):
+        """
+        Unmap the buffer, then remove the file if this FrameBuffer created it.
+        Frames returned by read should no longer be referenced; otherwise the buffer is unmapped when they are collected,
+        and a file that cannot be removed while it is mapped is removed when the process exits.
+        """
+        self._finalizer()
+
+def encode_delta(surface: Surface, rects: List[Rect], encoding: str) -> str:
+    """
+    Encode the changed areas of a surface as a delta frame line: <+width,height,encoding|x,y,w,h,data;...>
+    Each area's RGBX pixels are base64-encoded, after being compressed with zlib if the encoding is "zlib".
+    """
+    parts = []
+    for rect in rects:
+        if rect.width > 0 and rect.height > 0:
+            data = surface_to_str(surface.subsurface(rect), "RGBX")
+            if encoding == "zlib":
+                data = compress(data, 1)
+            parts.append("%d,%d,%d,%d,%s" % (rect.x, rect.y, rect.width, rect.height, b64encode(data).decode("ascii")))
+    return "<+%d,%d,%s|%s>" % (surface.get_width(), surface.get_height(), encoding, ";".join(parts))
+
+def apply_delta(frame: Surface or None, line: str) -> Surface:
+    """
+    Patch a frame with a delta frame line produced by encode_delta and return it.
+    A new frame is created if there is none yet or the size has changed.
+    """
+    header = line[2:line.find("|")].split(",")
+    width, height, encoding = int(header[0]), int(header[1]), header[2]
+    if frame == None or frame.get_size() != (width, height):
+        frame = Surface((width, height))
+    body = line[line.find("|") + 1:-1]
+    for part in body.split(";") if len(body) > 0 else []:
+        x, y, w, h, data = part.split(",")
+        data = b64decode(data)
+        if encoding == "zlib":
+            data = decompress(data)
+        frame.blit(frombuffer(data, (int(w), int(h)), "RGBX"), (int(x), int(y)))
+    return frame
+
+def _pack_field(kind: str, value) -> bytes:
+    if kind == "s":
+        data = str(value).encode("utf-8")
+        return Struct("<H").pack(len(data)) + data
+    elif kind == "B*":
+        return Struct("<B%dB" % len(value)).pack(len(value), *[int(v) for v in value])
+    elif kind == "2i":
+        return Struct("<2i").pack(int(value[0]), int(value[1]))
+    elif kind == "?":
+        return Struct("<?").pack(bool(value))
+    return Struct("<" + kind).pack(int(value))
+
+def _unpack_field(kind: str, record: bytes, offset: int) -> tuple:
+    if kind == "s":
+        length = Struct("<H").unpack_from(record, offset)[0]
+        return (str(record[offset + 2:offset + 2 + length], encoding="utf-8"), offset + 2 + length)
+    elif kind == "B*":
+        length = record[offset]
+        return (tuple(record[offset + 1:offset + 1 + length]), offset + 1 + length)
+    field = Struct("<" + kind)
+    value = field.unpack_from(record, offset)
+    return (value if kind == "2i" else value[0], offset + field.size)
+
+def encode_event(evt) -> bytes:
+    """
+    Encode an event as a binary record: its length, type and a mask of the fields present, followed by the packed fields.
+    Only the attributes listed in EVENT_FIELDS are sent; attributes that cannot be packed are left out.
+    """
+    mask = 0
+    body = b""
+    for i in range(len(EVENT_FIELDS)):
+        value = evt.__dict__.get(EVENT_FIELDS[i][0], None)
+        if value != None:
+            try:
+                body += _pack_field(EVENT_FIELDS[i][1], value)
+                mask |= 1 << i
+            except (TypeError, ValueError, IndexError, struct_error):
+                pass
+    return EVENT_HEADER.pack(EVENT_HEADER.size - 2 + len(body), evt.type, mask) + body
+
+def read_event(stream) -> PygameEvent or None:
+    """Read one event encoded by encode_event from a binary stream. Returns None at the end of the stream."""
+    size = stream.read(2)
+    if len(size) < 2:
+        return None
+    record = size + stream.read(Struct("<H").unpack(size)[0])
+    if len(record) < EVENT_HEADER.size:
+        return None
+    evt_type, mask = EVENT_HEADER.unpack_from(record, 0)[1:]
+    offset = EVENT_HEADER.size
+    attributes = {}
+    for i in range(len(EVENT_FIELDS)):
+        if mask & (1 << i):
+            attributes[EVENT_FIELDS[i][0]], offset = _unpack_field(EVENT_FIELDS[i][1], record, offset)
+    return PygameEvent(evt_type, attributes)
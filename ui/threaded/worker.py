@@ -0,0 +1,28 @@
+from sys import stdin, argv, path as import_path
+from os import chdir
+from os.path import abspath, dirname
+from json import loads as from_json
+from runpy import run_path
+from pygame import init
+
+import ui
+import ui.components
+import ui.components.dialogs
+
+"""
+This file is run by AppHost worker processes. It imports Polaron ahead of time, then runs the app it is given.
+"""
+
+def main():
+    init()
+    request = stdin.buffer.readline()
+    if len(request) == 0:
+        return
+    request = from_json(str(request, encoding="utf-8"))
+    chdir(request["local"])
+    argv[:] = [request["path"], *request["args"]]
+    import_path.insert(0, dirname(abspath(request["path"])))
+    run_path(request["path"], run_name="__main__")
+
+if __name__ == "__main__":
+    main()